@@ -1,12 +1,26 @@
-import os
+import functools
 import numpy as np
-import scipy
-import matplotlib
-import matplotlib.pylab as plt
-from scipy.interpolate import splrep, BSpline
-import krotov
-import qutip
-from qutip import Qobj
+from Timing import TIMINGS
+
+# Shared physics for the STIRAP GUIs: pulse smoothing, the Lambda-system
+# Hamiltonian, basis states and a reusable simulation session.
+#
+# Only NumPy is imported at module level; scipy, qutip and krotov take seconds
+# to import, so they are imported inside the functions that need them and the
+# windows can paint before the physics stack is loaded.
+
+# Number of time-grid points shared by smoothing, the solvers and scoring.
+# Pass samples= to use another resolution; nothing assumes this value.
+SAMPLES = 500
+
+# Candidate grids for Adaptive_Final_Population, coarsest first
+ADAPTIVE_GRIDS = (25, 50, 100, 200, 400, 800, 1600)
+
+
+def Check_Samples(samples):
+    """Raise ValueError unless samples gives at least one time step"""
+    if samples < 2:
+        raise ValueError("samples must be at least 2 (one time step), got %r" % (samples,))
 
 def Omega_P2_Guess(t, args):
     """Guess for the imaginary part of the pump pulse"""
@@ -17,8 +31,23 @@ def Omega_S2_Guess(t, args):
     return 0.0
 
 
-def Hamiltonian(Omega_P1_Smooth, Omega_S1_Smooth, E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5, Omega_S=4.5):
-    """Lambda-system Hamiltonian in the RWA"""
+@functools.lru_cache(maxsize=None)
+def Basis():
+    """Kets |1>, |2>, |3> and their projectors, built once"""
+    import qutip
+
+    Kets = tuple(qutip.Qobj(row) for row in np.eye(3))
+    Projectors = tuple(qutip.ket2dm(Ket) for Ket in Kets)
+    return Kets, Projectors
+
+
+@functools.lru_cache(maxsize=32)
+def Operators(E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5, Omega_S=4.5):
+    """(H_0, HP_Re, HP_Im, HS_Re, HS_Im), built once per parameter set
+
+    The returned Qobjs are shared between callers and must not be modified.
+    """
+    from qutip import Qobj
 
     # detunings
     P = E1 + Omega_P - E2
@@ -32,6 +61,13 @@ def Hamiltonian(Omega_P1_Smooth, Omega_S1_Smooth, E1=0.0, E2=10.0, E3=5.0, Omega
     HS_Re = -0.5 * Qobj([[0.0, 0.0, 0.0], [0.0, 0.0, 1.0], [0.0, 1.0, 0.0]])
     HS_Im = -0.5 * Qobj([[0.0, 0.0, 0.0], [0.0, 0.0, 1.0j], [0.0, -1.0j, 0.0]])
 
+    return H_0, HP_Re, HP_Im, HS_Re, HS_Im
+
+
+def Hamiltonian(Omega_P1_Smooth, Omega_S1_Smooth, E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5, Omega_S=4.5):
+    """Lambda-system Hamiltonian in the RWA"""
+    H_0, HP_Re, HP_Im, HS_Re, HS_Im = Operators(E1, E2, E3, Omega_P, Omega_S)
+
     return [
         H_0,
         [HP_Re, Omega_P1_Smooth],
@@ -41,10 +77,34 @@ def Hamiltonian(Omega_P1_Smooth, Omega_S1_Smooth, E1=0.0, E2=10.0, E3=5.0, Omega
     ]
 
 
-def RWA_Target_State(Ket_3, E2 = 10.0, Omega_S = 4.5, T = 5):
+def RWA_Target_State(Ket_3, E2=10.0, Omega_S=4.5, T=5):
     return np.exp(1j * (E2 - Omega_S) * T) * Ket_3
 
+# Frames for the qutip solver. "rwa" integrates Hamiltonian() as it is. In
+# "interaction" the static H_0 = diag(P, 0, S) is moved into the frame, so its
+# phase evolution is solved analytically and the integrator only follows the
+# slow pulse-driven dynamics; the couplings pick up the phases
+# exp(i P t) and exp(-i S t) instead. H_0 is diagonal, so populations are the
+# same in both frames and only the phase of level 3 changes, by exp(i S t).
+FRAMES = ("rwa", "interaction")
+
+# Solvers accepted by SimulationSession.solve
+SOLVERS = ("native", "lindblad", "qutip")
+
+def Interaction_Coefficients(Omega_P1_Smooth, Omega_S1_Smooth, tlist, E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5,
+                             Omega_S=4.5):
+    """Coefficients of (HP_Re, HP_Im, HS_Re, HS_Im) in the interaction frame of H_0"""
+    # detunings
+    P = E1 + Omega_P - E2
+    S = E3 + Omega_S - E2
+
+    tlist = np.asarray(tlist, dtype=float)
+    return (Omega_P1_Smooth * np.cos(P * tlist), Omega_P1_Smooth * np.sin(P * tlist),
+            Omega_S1_Smooth * np.cos(S * tlist), -Omega_S1_Smooth * np.sin(S * tlist))
+
 def Plot_Pulses(pulse, tlist, label):
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots()
     if callable(pulse):
         pulse = np.array([pulse(t, args=None) for t in tlist])
@@ -52,8 +112,10 @@ def Plot_Pulses(pulse, tlist, label):
     ax.set_xlabel('time')
     ax.set_ylabel('%s pulse amplitude' % label)
     plt.show()  # Remove the 'fig' argument here
-    
+
 def Plot_Population(result):
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots()
     ax.plot(result.times, result.expect[0], label='1')
     ax.plot(result.times, result.expect[1], label='2')
@@ -63,15 +125,237 @@ def Plot_Population(result):
     ax.set_ylabel('population')
     plt.show()
 
-def Omega_Smooth(Omega_Inputs, T_end):
-    #Pre-established Time-Domain
+# Presets offered by the GUI dropdowns besides "Free Hand"
+PRESETS = ("Sin Wave", "Cos Wave", "Gaussian")
+
+
+def Preset_Knots(name, pulse=0, knots=10):
+    """Knot values of a dropdown preset for pulse 0 (pump) or 1 (Stokes)
+
+    These are the values the GUI puts on the sliders. Only the pump's Cos Wave
+    has its end knots set to zero; the Stokes one keeps them at 1.
+    """
+    x_values = np.linspace(0, 2 * np.pi, knots)
+    if name == "Sin Wave":
+        values = np.sin(x_values)
+    elif name == "Cos Wave":
+        values = np.cos(x_values)
+        if pulse == 0:
+            values[0] = values[-1] = 0.0
+    elif name == "Gaussian":
+        values = np.exp(-(x_values - np.mean(x_values)) ** 2 / (2 * 1 ** 2))  # Gaussian with mean at x middle
+    else:
+        raise ValueError("unknown preset %r, expected one of %s" % (name, ", ".join(PRESETS)))
+    return values
+
+
+@functools.lru_cache(maxsize=16)
+def Smoothing_Matrix(T_end, samples=SAMPLES):
+    """(samples, T_end + 1) matrix taking knot values to the smooth pulse
+
+    The knots sit at the fixed points 0, 1, ..., T_end and splrep(..., s=0)
+    interpolates them exactly, so the smooth curve is linear in the knot
+    values. Column j is the curve for a unit value at knot j, built once per
+    (T_end, samples) with the same splrep/BSpline fit Omega_Smooth used to
+    run on every call. The returned array is shared and read-only.
+
+    Because the fit interpolates, no column is local: moving one knot changes
+    the whole pulse, with the change shrinking only by about 0.27 per knot
+    interval.
+    """
+    from scipy.interpolate import splrep, BSpline
+
+    # Pre-established Time-Domain
     T_axis = np.arange(0, T_end + 1)
+    t_smooth = np.linspace(0, T_end, samples)
+
+    Matrix = np.empty((samples, T_end + 1))
+    for j, Unit in enumerate(np.eye(T_end + 1)):
+        Matrix[:, j] = BSpline(*splrep(T_axis, Unit, s=0))(t_smooth)
+    Matrix.setflags(write=False)
+    return Matrix
+
+def Omega_Smooth(Omega_Inputs, T_end, samples=SAMPLES):
+    """Smooth pulse through the knots; (T_end + 1,) -> (samples,)
+
+    Leading batch dimensions are kept, so an (N, T_end + 1) stack of knot
+    vectors is smoothed with a single matrix multiply.
+    """
+    return np.asarray(Omega_Inputs, dtype=float) @ Smoothing_Matrix(T_end, samples).T
+
+
+def Final_Population(result):
+    """Level-3 population at the end of the grid, whatever its resolution"""
+    return result.expect[2][-1]
+
+def Score(result):
+    """The game score of a solve: final level-3 population in whole percent"""
+    return int(Final_Population(result) * 100)
+
+
+def Adaptive_Final_Population(Pump_Knots, Stokes_Knots, T_end=9, tolerance=1e-3, grids=ADAPTIVE_GRIDS, **params):
+    """(samples, final level-3 population, error estimate) from the coarsest grid pair that agrees
+
+    Grids are solved coarsest first with the native score-only solver. The
+    midpoint scheme converges quadratically, so a grid's distance from the
+    converged value is about 4/3 of its difference to the next finer grid.
+    The first grid whose estimate is below tolerance is accepted, and the
+    finer grid's population, already computed and more accurate, is returned
+    together with that estimate as a bound. If no grid is accepted the finest
+    grid's population is returned with the last estimate.
+    """
+    from Propagator import Final_Populations
+
+    def Solve(samples):
+        return Final_Populations(Omega_Smooth(Pump_Knots, T_end, samples), Omega_Smooth(Stokes_Knots, T_end, samples),
+                                 np.linspace(0, T_end, samples), **params)[2]
+
+    Previous = Solve(grids[0])
+    for fine in grids[1:]:
+        Current = Solve(fine)
+        error = 4.0 / 3.0 * abs(Current - Previous)
+        if error < tolerance:
+            break
+        Previous = Current
+    return fine, Current, error
+
+
+# Everything needed to simulate one pulse pair, set up once and reused.
+#
+# A session fixes the time grid and the system parameters. The operators,
+# basis states, projectors and target state come from the caches above, and
+# for the qutip solver every solve compiles a QobjEvo from the cached
+# operators and the new coefficient arrays, through qutip's public API; that
+# costs about as much as patching a compiled one and is small next to mesolve.
+# The imaginary parts are passed as zero arrays rather than the guess
+# functions so the Hamiltonian stays on qutip's array-coefficient fast path
+# (same dynamics, since the guesses are identically zero). The decay and
+# dephasing rates are only used by the open-system "lindblad" solver.
+class SimulationSession:
+    def __init__(self, T_end=9, samples=SAMPLES, E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5, Omega_S=4.5, Gamma_1=0.0,
+                 Gamma_3=0.0, dephasing=0.0):
+        Check_Samples(samples)
+        self.T_end = T_end
+        self.tlist = np.linspace(0, T_end, samples)
+        self.params = dict(E1=E1, E2=E2, E3=E3, Omega_P=Omega_P, Omega_S=Omega_S)
+        self.rates = dict(Gamma_1=Gamma_1, Gamma_3=Gamma_3, dephasing=dephasing)
+
+
+    @property
+    def kets(self):
+        return Basis()[0]
+
+    @property
+    def projectors(self):
+        return Basis()[1]
+
+    @property
+    def target(self):
+        return RWA_Target_State(self.kets[2], self.params["E2"], self.params["Omega_S"])
+
+    def frame_target(self, frame="rwa"):
+        """The target state as it reads at T_end in frame
+
+        In the interaction frame the level-3 phase exp(i S T_end) that H_0
+        would have added is applied here instead of being integrated.
+        """
+        if frame == "rwa":
+            return self.target
+        S = self.params["E3"] + self.params["Omega_S"] - self.params["E2"]
+        return np.exp(1j * S * self.T_end) * self.target
+
+    def hamiltonian(self, Omega_P1_Smooth, Omega_S1_Smooth):
+        """Hamiltonian list for krotov, built from the cached operators"""
+        return Hamiltonian(Omega_P1_Smooth, Omega_S1_Smooth, **self.params)
+
+    def smooth(self, Pump_Knots, Stokes_Knots):
+        """Smoothed pump and Stokes pulses on the session grid"""
+        samples = len(self.tlist)
+        return Omega_Smooth(Pump_Knots, self.T_end, samples), Omega_Smooth(Stokes_Knots, self.T_end, samples)
+
+    def solve(self, Omega_P1_Smooth, Omega_S1_Smooth, solver="native", frame="rwa", tlist=None):
+        """Populations of the three levels; a qutip Result or PropagatorResult
+
+        solver is "native", "lindblad" (native, with the session's decay and
+        dephasing rates) or "qutip". frame (see FRAMES) and tlist only apply
+        to "qutip": the native solvers exponentiate H_0 exactly in every step
+        and report on the session grid. tlist picks the output times of
+        mesolve, e.g. [0, T_end] for the final populations only; the pulses
+        stay sampled on the session grid.
+        """
+        if solver not in SOLVERS:
+            raise ValueError("unknown solver %r, expected one of %s" % (solver, ", ".join(SOLVERS)))
+        if tlist is not None and solver != "qutip":
+            raise ValueError("tlist is only supported by the qutip solver")
+
+        if solver == "native":
+            from Propagator import Native_Solve
+            with TIMINGS.span("native_solve"):
+                return Native_Solve(Omega_P1_Smooth, Omega_S1_Smooth, self.tlist, **self.params)
+
+        if solver == "lindblad":
+            from Lindblad import Open_Propagate
+            from Propagator import PropagatorResult
+            with TIMINGS.span("lindblad_solve"):
+                return PropagatorResult(self.tlist, Open_Propagate(Omega_P1_Smooth, Omega_S1_Smooth, self.tlist,
+                                                                   **self.params, **self.rates))
+
+        import qutip
+        with TIMINGS.span("hamiltonian"):
+            H = self._compiled_hamiltonian(Omega_P1_Smooth, Omega_S1_Smooth, frame)
+        with TIMINGS.span("mesolve"):
+            return qutip.mesolve(H, self.kets[0], self.tlist if tlist is None else tlist, [], list(self.projectors))
+
+    def target_overlap(self, Omega_P1_Smooth, Omega_S1_Smooth, frame="rwa"):
+        """<target|psi(T_end)> from the qutip solver in frame
+
+        The final state is compared with frame_target(frame), so the overlap,
+        phase included, is the same in every frame.
+        """
+        import qutip
+        H = self._compiled_hamiltonian(Omega_P1_Smooth, Omega_S1_Smooth, frame)
+        Psi_T = qutip.mesolve(H, self.kets[0], [0.0, self.T_end], [], []).states[-1]
+        return self.frame_target(frame).overlap(Psi_T)
+
+    def final_populations(self, Omega_P1_Smooth, Omega_S1_Smooth):
+        """Populations of the three levels at T_end only, without traces (native solver)"""
+        from Propagator import Final_Populations
+        with TIMINGS.span("native_final"):
+            return Final_Populations(Omega_P1_Smooth, Omega_S1_Smooth, self.tlist, **self.params)
+
+    def gradient(self, Pump_Knots, Stokes_Knots):
+        """(final level-3 population, d/dPump_Knots, d/dStokes_Knots) on the session grid
+
+        Computed with the native adjoint method; see Propagator.Knot_Gradient.
+        """
+        from Propagator import Knot_Gradient
+        with TIMINGS.span("gradient"):
+            return Knot_Gradient(Pump_Knots, Stokes_Knots, self.T_end, len(self.tlist), **self.params)
+
+    def _compiled_hamiltonian(self, Omega_P1_Smooth, Omega_S1_Smooth, frame="rwa"):
+        import qutip
+
+        Omega_P1_Smooth = np.array(Omega_P1_Smooth, dtype=float)
+        Omega_S1_Smooth = np.array(Omega_S1_Smooth, dtype=float)
+        H_0, HP_Re, HP_Im, HS_Re, HS_Im = Operators(**self.params)
+
+        if frame == "rwa":
+            Zero = np.zeros_like(self.tlist)
+            Static, Coefficients = [H_0], (Omega_P1_Smooth, Zero, Omega_S1_Smooth, Zero)
+        elif frame == "interaction":
+            Static = []
+            Coefficients = Interaction_Coefficients(Omega_P1_Smooth, Omega_S1_Smooth, self.tlist, **self.params)
+        else:
+            raise ValueError("unknown frame %r, expected one of %s" % (frame, ", ".join(FRAMES)))
 
-    #Random Values given by User
-    tck = splrep(T_axis, Omega_Inputs, s=0)
+        H = qutip.QobjEvo(Static + [[operator, coeff] for operator, coeff in
+                                    zip((HP_Re, HP_Im, HS_Re, HS_Im), Coefficients)], tlist=self.tlist)
+        H.compile()
+        return H
 
-    #Making the random values into Smooth Function (time below is also pre-established)
-    t_smooth = np.linspace(0, T_end, 500)
-    Pulse_smooth = BSpline(*tck)(t_smooth)
 
-    return Pulse_smooth
+@functools.lru_cache(maxsize=8)
+def Simulation_Session(T_end=9, samples=SAMPLES, E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5, Omega_S=4.5, Gamma_1=0.0,
+                       Gamma_3=0.0, dephasing=0.0):
+    """Shared SimulationSession for a grid and parameter set"""
+    return SimulationSession(T_end, samples, E1, E2, E3, Omega_P, Omega_S, Gamma_1, Gamma_3, dephasing)
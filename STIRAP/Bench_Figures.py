@@ -0,0 +1,83 @@
+import argparse
+import os
+import resource
+import sys
+import time
+
+# Memory / figure-count regression check for repeated "Shoot the Lasers" clicks.
+#
+# Drives the real AdjustablePlots window offscreen through thousands of clicks
+# (worker round trip, scoring and plotting included) and checks that neither
+# the number of live matplotlib figures nor the resident memory keeps growing.
+# Exits with status 1 when either does.
+
+STIRAP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def Resident_MB():
+    """Current resident set size, falling back to the peak where /proc is missing"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that repeated clicks do not leak figures or memory")
+    parser.add_argument("--clicks", type=int, default=1000)
+    parser.add_argument("--max-growth-mb", type=float, default=20.0,
+                        help="allowed resident-memory growth after the warm-up clicks")
+    options = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, STIRAP_DIR)
+    os.chdir(STIRAP_DIR)
+
+    import numpy as np
+    import matplotlib.pyplot as plt
+    from PyQt5.QtWidgets import QApplication
+    import Main
+
+    app = QApplication(sys.argv)
+    window = Main.AdjustablePlots()
+    window.result_cache.path = None
+    window.result_cache.max_bytes = 0  # every click must really simulate and plot
+
+    done = []
+    window.simulation_worker.finished.connect(lambda request_id, result: done.append(request_id))
+
+    rng = np.random.default_rng(0)
+    warm_up = max(1, options.clicks // 10)
+    start = time.perf_counter()
+
+    for click in range(options.clicks):
+        for pulse in (0, 1):
+            knots = np.zeros(10)
+            knots[1:-1] = np.round(rng.uniform(-1, 1, 8), 2)
+            window.pulse_model.set_values(pulse, knots)
+
+        expected = len(done) + 1
+        window.on_button_click()
+        while len(done) < expected:
+            app.processEvents()
+        app.processEvents()
+
+        if click + 1 == warm_up:
+            figures_before = len(plt.get_fignums())
+            memory_before = Resident_MB()
+
+    figures_after = len(plt.get_fignums())
+    memory_after = Resident_MB()
+    elapsed = time.perf_counter() - start
+
+    print("clicks:           %d (%.1f ms each)" % (options.clicks, elapsed / options.clicks * 1e3))
+    print("pyplot figures:   %d -> %d" % (figures_before, figures_after))
+    print("resident memory:  %.1f MB -> %.1f MB" % (memory_before, memory_after))
+
+    window.close()
+
+    if figures_after > figures_before or memory_after - memory_before > options.max_growth_mb:
+        print("FAIL: figures or memory grow with clicks")
+        sys.exit(1)
+    print("OK")
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Accuracy and speed of the qutip solver in the RWA frame and in the
+# interaction frame of H_0 (Backend.FRAMES), over growing detunings.
+#
+# The pump and Stokes are detuned together (P = S = detuning, two-photon
+# resonance) and a set of random slider pulses is solved in each frame, once
+# with output on the whole session grid as the GUI asks for it and once with
+# output at T_end only, where the integrator is free to take long steps. The
+# error is the final level-3 population against the native propagator on a
+# fine grid, which does not depend on the frame. A solve that qutip gives up
+# on (too many substeps) is counted as failed.
+
+STIRAP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DETUNINGS = (-0.5, 2.0, 5.0, 10.0, 20.0)
+REFERENCE_SAMPLES = 8000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the qutip solver frames")
+    parser.add_argument("--pulses", type=int, default=10)
+    parser.add_argument("--amplitude", type=float, default=3.0, help="scale of the random knot values")
+    parser.add_argument("--output", help="write the rows as JSON to this file")
+    options = parser.parse_args()
+
+    sys.path.insert(0, STIRAP_DIR)
+    import warnings
+    import numpy as np
+    from Backend import FRAMES, Omega_Smooth, Simulation_Session
+    from Propagator import Final_Populations
+
+    rng = np.random.default_rng(0)
+    pulses = []
+    for _ in range(options.pulses):
+        Knots = np.zeros((2, 10))
+        Knots[:, 1:-1] = options.amplitude * rng.uniform(-1, 1, (2, 8))
+        pulses.append((Knots[0], Knots[1]))
+
+    rows = []
+    print("%9s  %-11s  %-6s %10s %11s %7s" % ("detuning", "frame", "output", "ms/solve", "max error", "failed"))
+    for detuning in DETUNINGS:
+        params = dict(Omega_P=10.0 + detuning, Omega_S=5.0 + detuning)
+        session = Simulation_Session(9, **params)
+        t_fine = np.linspace(0, 9, REFERENCE_SAMPLES)
+        reference = [Final_Populations(Omega_Smooth(Pump_Knots, 9, REFERENCE_SAMPLES),
+                                       Omega_Smooth(Stokes_Knots, 9, REFERENCE_SAMPLES), t_fine, **params)[2]
+                     for Pump_Knots, Stokes_Knots in pulses]
+
+        for frame in FRAMES:
+            for output, times in (("grid", session.tlist), ("final", [0.0, 9.0])):
+                seconds, errors, failed = 0.0, [], 0
+                for (Pump_Knots, Stokes_Knots), expected in zip(pulses, reference):
+                    Omega_P1_Smooth, Omega_S1_Smooth = session.smooth(Pump_Knots, Stokes_Knots)
+                    start = time.perf_counter()
+                    try:
+                        with warnings.catch_warnings():
+                            warnings.simplefilter("ignore")
+                            result = session.solve(Omega_P1_Smooth, Omega_S1_Smooth, "qutip", frame, times)
+                    except Exception:
+                        failed += 1
+                        continue
+                    finally:
+                        seconds += time.perf_counter() - start
+                    errors.append(abs(result.expect[2][-1] - expected))
+
+                row = {"detuning": detuning, "frame": frame, "output": output,
+                       "ms_per_solve": seconds / len(pulses) * 1e3,
+                       "max_error": float(max(errors)) if errors else None, "failed": failed}
+                rows.append(row)
+                print("%9.1f  %-11s  %-6s %10.2f %11s %7d" % (
+                    detuning, frame, output, row["ms_per_solve"],
+                    "%.2e" % row["max_error"] if errors else "-", failed))
+
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump({"reference_samples": REFERENCE_SAMPLES, "pulses": options.pulses,
+                       "amplitude": options.amplitude, "rows": rows}, file, indent=2)
@@ -0,0 +1,62 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Frame-time benchmark for slider interaction on the pulse plots.
+#
+# Drives a slider of the offscreen Main window tick by tick and times each
+# tick from setValue() until Qt has processed the resulting repaint. The
+# "blit" case is the normal update_slider path; the "full redraw" case adds a
+# canvas.draw() per tick, which is what every tick cost before blitting.
+
+STIRAP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def Frame_Times(app, window, slider, ticks, full_redraw):
+    times = []
+    for tick in range(ticks):
+        start = time.perf_counter()
+        slider.setValue((tick * 7) % 200 - 100)
+        if full_redraw:
+            window.canvas.draw()
+        app.processEvents()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def Summary(times):
+    ordered = sorted(times)
+    return statistics.median(ordered) * 1e3, ordered[int(0.95 * (len(ordered) - 1))] * 1e3
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time slider ticks on the pulse plots")
+    parser.add_argument("--ticks", type=int, default=300)
+    options = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, STIRAP_DIR)
+    os.chdir(STIRAP_DIR)
+
+    from PyQt5.QtWidgets import QApplication
+    import Main
+
+    app = QApplication(sys.argv)
+    window = Main.AdjustablePlots()
+    window.result_cache.path = None
+    window.show()
+    window.canvas.draw()
+    app.processEvents()
+
+    slider = window.sliders1[4]
+    results = {}
+    for name, full_redraw in (("full redraw", True), ("blit", False)):
+        Frame_Times(app, window, slider, 20, full_redraw)  # warm-up
+        results[name] = Summary(Frame_Times(app, window, slider, options.ticks, full_redraw))
+
+    for name, (median, p95) in results.items():
+        print("%-12s median %6.2f ms   p95 %6.2f ms   (%.0f fps)" % (name, median, p95, 1e3 / median))
+
+    window.close()
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Accuracy versus time for the time-grid resolution.
+#
+# For a set of random slider pulses every candidate grid is solved with the
+# native propagator (and optionally the qutip session) and compared with a
+# converged reference on a much finer grid. The table shows the time per
+# solve, the worst and mean error of the final level-3 population and how
+# often the integer score differs from the reference; the adaptive mode
+# (Backend.Adaptive_Final_Population) is reported the same way, with how often
+# its error estimate bounds the actual error. The last lines suggest the coarsest grid for live
+# play (error below --live-tolerance) and for audits (no score changes).
+
+STIRAP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+GRIDS = (25, 50, 100, 200, 250, 500, 1000, 2000)
+REFERENCE_SAMPLES = 8000
+
+
+def Time_Per_Call(function, pulses):
+    start = time.perf_counter()
+    values = [function(Pump_Knots, Stokes_Knots) for Pump_Knots, Stokes_Knots in pulses]
+    return (time.perf_counter() - start) / len(pulses), values
+
+
+def Row(name, seconds, finals, reference):
+    import numpy as np
+
+    finals = np.asarray(finals)
+    error = np.abs(finals - reference)
+    return {"grid": name, "ms_per_solve": seconds * 1e3, "max_error": float(error.max()),
+            "mean_error": float(error.mean()),
+            "score_changes": float(np.mean((finals * 100).astype(int) != (reference * 100).astype(int)))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy versus time for the time-grid resolution")
+    parser.add_argument("--pulses", type=int, default=200)
+    parser.add_argument("--qutip", action="store_true", help="also time the qutip session solver")
+    parser.add_argument("--live-tolerance", type=float, default=1e-3)
+    parser.add_argument("--output", help="write the rows as JSON to this file")
+    options = parser.parse_args()
+
+    sys.path.insert(0, STIRAP_DIR)
+    import numpy as np
+    from Backend import Adaptive_Final_Population, Final_Population, Omega_Smooth, Simulation_Session
+    from Propagator import Final_Populations
+
+    rng = np.random.default_rng(0)
+    pulses = []
+    for _ in range(options.pulses):
+        Knots = np.zeros((2, 10))
+        Knots[:, 1:-1] = np.round(rng.uniform(-1, 1, (2, 8)), 2)
+        pulses.append((Knots[0], Knots[1]))
+
+    def Native(samples):
+        t = np.linspace(0, 9, samples)
+        return lambda Pump_Knots, Stokes_Knots: Final_Populations(
+            Omega_Smooth(Pump_Knots, 9, samples), Omega_Smooth(Stokes_Knots, 9, samples), t)[2]
+
+    _, reference = Time_Per_Call(Native(REFERENCE_SAMPLES), pulses)
+    reference = np.asarray(reference)
+
+    rows = []
+    for samples in GRIDS:
+        Native(samples)(*pulses[0])  # warm the smoothing matrix
+        rows.append(Row(samples, *Time_Per_Call(Native(samples), pulses), reference))
+
+        if options.qutip:
+            session = Simulation_Session(9, samples)
+            solve = lambda Pump_Knots, Stokes_Knots: Final_Population(
+                session.solve(*session.smooth(Pump_Knots, Stokes_Knots), solver="qutip"))
+            solve(*pulses[0])
+            rows.append(Row("%d qutip" % samples, *Time_Per_Call(solve, pulses[:max(1, len(pulses) // 10)]),
+                            reference[:max(1, len(pulses) // 10)]))
+
+    def Adaptive(Pump_Knots, Stokes_Knots):
+        return Adaptive_Final_Population(Pump_Knots, Stokes_Knots, tolerance=options.live_tolerance)
+
+    seconds, results = Time_Per_Call(Adaptive, pulses)
+    chosen, finals, estimates = (np.array(values) for values in zip(*results))
+    rows.append(dict(Row("adaptive", seconds, finals, reference),
+                     median_grid=float(np.median(chosen)), max_grid=int(np.max(chosen)),
+                     bound_held=float(np.mean(np.abs(finals - reference) <= estimates))))
+
+    print("%-12s %10s %11s %11s %14s" % ("grid", "ms/solve", "max error", "mean error", "score changes"))
+    for row in rows:
+        print("%-12s %10.3f %11.2e %11.2e %13.1f%%" % (row["grid"], row["ms_per_solve"], row["max_error"],
+                                                      row["mean_error"], row["score_changes"] * 100))
+    print("adaptive grids: median %d, max %d points; error within its estimate for %.1f%%" % (
+        rows[-1]["median_grid"], rows[-1]["max_grid"], rows[-1]["bound_held"] * 100))
+
+    native = [row for row in rows if isinstance(row["grid"], int)]
+    live = next((row["grid"] for row in native if row["max_error"] < options.live_tolerance), None)
+    audit = next((row["grid"] for row in native if row["score_changes"] == 0), None)
+    print("live:  coarsest grid with max error < %g: %s" % (options.live_tolerance, live))
+    print("audit: coarsest grid with no score changes: %s" % audit)
+
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump({"reference_samples": REFERENCE_SAMPLES, "pulses": options.pulses, "rows": rows}, file, indent=2)
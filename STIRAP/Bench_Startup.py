@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# Cold-start measurement for the kiosk entry points.
+#
+# Every sample runs in a fresh interpreter so nothing is already imported.
+# Two numbers are recorded per entry point: the time to import its module and
+# the time from interpreter start-up to the first paint event of its window.
+# Run with QT_QPA_PLATFORM=offscreen on machines without a display.
+
+STIRAP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ENTRY_POINTS = {
+    "Main": "AdjustablePlots",
+    "FreeHand": "AdjustablePlots",
+    "BlackmanPulse": "BlackmanPulseGUI",
+    "SinWaves": "SineWaveGUI",
+}
+
+CHILD = r"""
+import time
+start = time.perf_counter()
+import importlib, json, os, sys
+sys.path.insert(0, {directory!r})
+os.chdir({directory!r})
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QObject, QEvent
+
+app = QApplication(sys.argv)
+before_import = time.perf_counter()
+module = importlib.import_module({module!r})
+import_time = time.perf_counter() - before_import
+
+class FirstPaint(QObject):
+    painted = None
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and self.painted is None:
+            self.painted = time.perf_counter()
+            app.quit()
+        return False
+
+window = getattr(module, {window_class!r})()
+first_paint = FirstPaint()
+window.installEventFilter(first_paint)
+window.show()
+app.exec_()
+print(json.dumps({{"import_s": import_time, "first_paint_s": first_paint.painted - start,
+                   "heavy_modules": sorted(m for m in ("qutip", "krotov", "scipy", "requests") if m in sys.modules)}}))
+"""
+
+
+def Measure(module, window_class, repeats):
+    """Median import and first-paint times over fresh interpreters"""
+    samples = []
+    for _ in range(repeats):
+        code = CHILD.format(directory=STIRAP_DIR, module=module, window_class=window_class)
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {
+        "import_s": statistics.median(s["import_s"] for s in samples),
+        "first_paint_s": statistics.median(s["first_paint_s"] for s in samples),
+        "heavy_modules_at_first_paint": samples[-1]["heavy_modules"],
+        "repeats": repeats,
+    }
+
+
+def Git_Revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=STIRAP_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the STIRAP kiosk windows")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="append the results as one JSON line to this file")
+    parser.add_argument("entry_points", nargs="*", default=list(ENTRY_POINTS))
+    options = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    results = {}
+    for module in options.entry_points:
+        results[module] = Measure(module, ENTRY_POINTS[module], options.repeats)
+        print("%-14s import %7.1f ms   first paint %7.1f ms" % (
+            module, results[module]["import_s"] * 1e3, results[module]["first_paint_s"] * 1e3))
+
+    if options.output:
+        record = {"revision": Git_Revision(), "time": time.time(), "python": platform.python_version(),
+                  "machine": platform.node(), "results": results}
+        with open(options.output, "a") as file:
+            file.write(json.dumps(record) + "\n")
@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from Bench_Startup import Git_Revision
+
+# Benchmark suite for the physics and GUI hot paths of the kiosk.
+#
+# Every case reports the median seconds per operation over several timed
+# runs (after a warm-up run), so lower is always better; throughput cases
+# report seconds per item. Results are written as JSON and compared against
+# a stored baseline, and the run exits with status 1 when any case is slower
+# than the baseline by more than the tolerance. Re-record the baseline with
+# --update-baseline after an intended change or on new kiosk hardware.
+#
+#   python Bench_Suite.py                      # run all cases, compare
+#   python Bench_Suite.py smooth hamiltonian   # run selected cases
+#   python Bench_Suite.py --update-baseline
+
+STIRAP_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(STIRAP_DIR, "bench_baseline.json")
+RESULTS_FILE = os.path.join(STIRAP_DIR, "bench_results.json")
+
+MESOLVE_RESOLUTIONS = (100, 250, 500, 1000)
+
+
+def Median_Seconds(operation, repeats, number=1):
+    """Median wall time of one call of operation, after one warm-up round"""
+    for _ in range(number):
+        operation()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            operation()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
+
+
+def Example_Knots():
+    # Gaussian pump and Stokes pulses, the same knots as the GUI preset
+    import numpy as np
+
+    x_values = np.linspace(0, 2 * np.pi, 10)
+    Gaussian = np.exp(-(x_values - np.mean(x_values)) ** 2 / (2 * 1 ** 2))
+    return Gaussian, Gaussian.copy()
+
+
+def Bench_Smooth(repeats):
+    from Backend import Omega_Smooth
+
+    Pump_Knots, _ = Example_Knots()
+    return {"smooth": Median_Seconds(lambda: Omega_Smooth(Pump_Knots, 9), repeats, number=1000)}
+
+
+def Bench_Hamiltonian(repeats):
+    from Backend import Hamiltonian, Omega_Smooth
+
+    Pump_Knots, Stokes_Knots = Example_Knots()
+    Omega_P1_Smooth, Omega_S1_Smooth = Omega_Smooth(Pump_Knots, 9), Omega_Smooth(Stokes_Knots, 9)
+    return {"hamiltonian": Median_Seconds(lambda: Hamiltonian(Omega_P1_Smooth, Omega_S1_Smooth), repeats,
+                                          number=1000)}
+
+
+def Bench_Mesolve(repeats):
+    import numpy as np
+    import krotov
+    from Backend import Basis, Hamiltonian, Omega_Smooth, RWA_Target_State
+
+    Pump_Knots, Stokes_Knots = Example_Knots()
+    Kets, Projectors = Basis()
+
+    results = {}
+    for samples in MESOLVE_RESOLUTIONS:
+        t = np.linspace(0, 9, samples)
+        H = Hamiltonian(Omega_Smooth(Pump_Knots, 9, samples), Omega_Smooth(Stokes_Knots, 9, samples))
+        Objective = krotov.Objective(initial_state=Kets[0], target=RWA_Target_State(Kets[2]), H=H)
+        results["mesolve_%d" % samples] = Median_Seconds(
+            lambda: Objective.mesolve(t, e_ops=list(Projectors)), max(3, repeats // 4))
+    return results
+
+
+def _Window():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    import Main
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = Main.AdjustablePlots()
+    window.result_cache.path = None
+    window.show()
+    window.canvas.draw()
+    app.processEvents()
+    return app, window
+
+
+def Bench_Button_Click(repeats):
+    import numpy as np
+
+    app, window = _Window()
+    window.result_cache.max_bytes = 0  # every click must really simulate
+    rng = np.random.default_rng(0)
+    done = []
+    window.simulation_worker.finished.connect(lambda request_id, result: done.append(request_id))
+
+    def Click():
+        for pulse in (0, 1):
+            knots = np.zeros(10)
+            knots[1:-1] = np.round(rng.uniform(-1, 1, 8), 2)
+            window.pulse_model.set_values(pulse, knots)
+        expected = len(done) + 1
+        window.on_button_click()
+        while len(done) < expected:
+            app.processEvents()
+        app.processEvents()
+
+    try:
+        return {"button_click": Median_Seconds(Click, repeats)}
+    finally:
+        window.close()
+
+
+def Bench_Slider(repeats):
+    app, window = _Window()
+    slider = window.sliders1[4]
+    ticks = iter(range(10 ** 9))
+
+    def Tick():
+        slider.setValue((next(ticks) * 7) % 200 - 100)
+        app.processEvents()
+
+    try:
+        return {"slider_tick": Median_Seconds(Tick, repeats, number=10)}
+    finally:
+        window.close()
+
+
+def Bench_Batch(repeats):
+    import numpy as np
+    from Propagator import Simulate_Batch
+
+    rng = np.random.default_rng(0)
+    Pump_Knots = np.zeros((1000, 10))
+    Stokes_Knots = np.zeros((1000, 10))
+    Pump_Knots[:, 1:-1] = rng.uniform(-1, 1, (1000, 8))
+    Stokes_Knots[:, 1:-1] = rng.uniform(-1, 1, (1000, 8))
+    seconds = Median_Seconds(lambda: Simulate_Batch(Pump_Knots, Stokes_Knots), max(3, repeats // 4))
+    return {"batch_per_pair": seconds / len(Pump_Knots)}
+
+
+CASES = {
+    "smooth": Bench_Smooth,
+    "hamiltonian": Bench_Hamiltonian,
+    "mesolve": Bench_Mesolve,
+    "button_click": Bench_Button_Click,
+    "slider": Bench_Slider,
+    "batch": Bench_Batch,
+}
+
+
+def Compare(results, baseline, tolerance):
+    """[(name, seconds, baseline seconds)] for every result slower than allowed"""
+    return [(name, seconds, baseline[name]) for name, seconds in results.items()
+            if name in baseline and seconds > baseline[name] * (1 + tolerance)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the STIRAP physics and GUI hot paths")
+    parser.add_argument("cases", nargs="*", help="cases to run (default: all of %s)" % ", ".join(CASES))
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", default=RESULTS_FILE, help="JSON file for the results")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown against the baseline, as a fraction")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    options = parser.parse_args()
+    for case in options.cases:
+        if case not in CASES:
+            parser.error("unknown case %r" % case)
+
+    sys.path.insert(0, STIRAP_DIR)
+    os.chdir(STIRAP_DIR)
+
+    results = {}
+    for case in options.cases or CASES:
+        results.update(CASES[case](options.repeats))
+
+    record = {"revision": Git_Revision(), "time": time.time(), "python": platform.python_version(), "machine": platform.node(),
+              "processor": platform.processor() or platform.machine(), "results": results}
+    with open(options.output, "w") as file:
+        json.dump(record, file, indent=2)
+
+    baseline = {}
+    if os.path.exists(options.baseline):
+        with open(options.baseline) as file:
+            baseline = json.load(file)["results"]
+
+    for name, seconds in results.items():
+        reference = " (baseline %10.4f ms, %+5.0f%%)" % (
+            baseline[name] * 1e3, (seconds / baseline[name] - 1) * 100) if name in baseline else ""
+        print("%-16s %10.4f ms%s" % (name, seconds * 1e3, reference))
+
+    if options.update_baseline:
+        baseline.update(results)
+        with open(options.baseline, "w") as file:
+            json.dump(dict(record, results=baseline), file, indent=2)
+        print("baseline updated: %s" % options.baseline)
+        sys.exit(0)
+
+    slower = Compare(results, baseline, options.tolerance)
+    for name, seconds, reference in slower:
+        print("REGRESSION: %s %.3f ms vs baseline %.3f ms" % (name, seconds * 1e3, reference * 1e3))
+    sys.exit(1 if slower else 0)
@@ -2,9 +2,10 @@ import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.lines import Line2D
 from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QLabel, QSlider, QPushButton, QComboBox
 from PyQt5.QtCore import Qt
+from Rendering import BlitManager
+from PulseModel import PulseModel
 
 # Custom Slider class with custom styles
 class Slider(QSlider):
@@ -60,20 +61,18 @@ class AdjustablePlots(QMainWindow):
         self.y_values1 = [0.0, 0, 0, 0, 0, 0, 0, 0]
         self.y_values2 = [0.0, 0, 0, 0, 0, 0, 0, 0]
 
-        # Initialize the plots with initial data points
-        self.plot1, = self.ax1.plot(self.x_values, self.y_values1, 'bo')
-        self.plot2, = self.ax2.plot(self.x_values, self.y_values2, 'bo')
+        # Initialize the plots with initial data points, each pulse is one
+        # polyline artist through its knots
+        self.plot1, = self.ax1.plot(self.x_values, self.y_values1, 'bo-', lw=1)
+        self.plot2, = self.ax2.plot(self.x_values, self.y_values2, 'bo-', lw=1)
 
-        # Create lines to connect the points on the plots
-        self.lines1 = [Line2D([], [], linestyle='-', color='blue', lw=1) for _ in range(7)]  # Adjusted to 7 lines
-        self.lines2 = [Line2D([], [], linestyle='-', color='blue', lw=1) for _ in range(7)]  # Adjusted to 7 lines
+        # Slider changes only repaint the pulse artists over a cached background
+        self.blit_manager = BlitManager(self.canvas, [self.plot1, self.plot2])
 
-        # Add lines to the plots
-        for line in self.lines1:
-            self.ax1.add_line(line)
-
-        for line in self.lines2:
-            self.ax2.add_line(line)
+        # Knot values of both pulses; sliders and presets write here and the
+        # plots follow its coalesced change notifications
+        self.pulse_model = PulseModel(len(self.x_values))
+        self.pulse_model.changed.connect(self.on_pulses_changed)
 
         # Update lines with initial coordinates
         self.update_lines()
@@ -130,7 +129,7 @@ class AdjustablePlots(QMainWindow):
                 slider = Slider(Qt.Horizontal)  # Horizontal slider
                 slider.setRange(-100, 100)  # Set the range of the slider from -100 to 100
                 slider.setValue(int(y_values[j] * 100))  # Set the initial value of the slider based on y_values
-                slider.valueChanged.connect(lambda val, plot=plot, index=j: self.update_slider(val, plot, index))
+                slider.valueChanged.connect(lambda val, pulse=i, index=j: self.update_slider(val, pulse, index))
                 sliders_layout.addWidget(slider)  # Add the slider to the layout
                 sliders.append(slider)  # Add the slider to the list
 
@@ -174,12 +173,7 @@ class AdjustablePlots(QMainWindow):
         elif selected_option == "Gaussian":
             self.y_values1 = np.exp(-(self.x_values - np.mean(self.x_values))**2 / (2 * 1**2))  # Gaussian with mean at x middle
 
-        for slider, y_value in zip(self.sliders1, self.y_values1):
-            slider.setValue(int(y_value * 100))
-
-        self.plot1.set_ydata(self.y_values1)
-        self.update_lines()
-        self.canvas.draw_idle()
+        self.apply_preset(0, self.y_values1, self.sliders1)
 
     # Method to update plot and sliders based on dropdown selection for Plot 2
     def update_dropdown2(self):
@@ -193,36 +187,37 @@ class AdjustablePlots(QMainWindow):
         elif selected_option == "Gaussian":
             self.y_values2 = np.exp(-(self.x_values - np.mean(self.x_values))**2 / (2 * 1**2))  # Gaussian with mean at x middle
 
-        for slider, y_value in zip(self.sliders2, self.y_values2):
-            slider.setValue(int(y_value * 100))
+        self.apply_preset(1, self.y_values2, self.sliders2)
 
-        self.plot2.set_ydata(self.y_values2)
-        self.update_lines()
-        self.canvas.draw_idle()
+    # Method to move a pulse's sliders and knots to a preset in one model update
+    def apply_preset(self, pulse, y_values, sliders):
+        with self.pulse_model.batch():
+            for slider, y_value in zip(sliders, y_values):
+                slider.setValue(int(y_value * 100))
+            # Keep the unrounded preset values rather than the slider steps
+            self.pulse_model.set_values(pulse, y_values)
 
-    # Method to update the y-values of the plots based on the slider values
-    def update_slider(self, val, plot, index):
-        y_values = plot.get_ydata()  # Get the current y-values of the plot
-        y_values[index] = val / 100.0  # Update the corresponding y-value based on the slider value
-        plot.set_ydata(y_values)  # Set the updated y-values to the plot
+    # Method to update the knot values based on the slider values
+    def update_slider(self, val, pulse, index):
+        self.pulse_model.set_value(pulse, index, val / 100.0)  # Update the corresponding knot value
 
-        self.update_lines()  # Update the lines connecting the points on the plot
+    # Method to follow model changes: once per slider tick or per preset
+    def on_pulses_changed(self, pulses):
+        plots = [[self.plot1, self.plot2][pulse] for pulse in pulses]
+        for pulse, plot in zip(pulses, plots):
+            plot.set_ydata(self.pulse_model.values(pulse))
 
-        self.canvas.draw_idle()  # Redraw the plot canvas
+        self.update_lines(plots)  # Repaint only the changed pulses
 
-    # Method to update the lines connecting the points on the plots
-    def update_lines(self):
-        for i, (plot, lines) in enumerate([(self.plot1, self.lines1), (self.plot2, self.lines2)]):
-            for j, line in enumerate(lines):
-                x_values = self.x_values[j:j + 2]  # Get the x-values of two adjacent points
-                y_values = plot.get_ydata()[j:j + 2]  # Get the y-values of two adjacent points
-                line.set_data(x_values, y_values)  # Update the line with the new coordinates
+    # Method to repaint the pulse polylines (all of them by default)
+    def update_lines(self, plots=None):
+        self.blit_manager.update(plots)
 
     # Method to handle button click event
     def on_button_click(self):
         # Print the values of the 16 points on the plots to console
-        print("Plot 1 Y-Values:", self.plot1.get_ydata())
-        print("Plot 2 Y-Values:", self.plot2.get_ydata())
+        print("Plot 1 Y-Values:", self.pulse_model.values(0))
+        print("Plot 2 Y-Values:", self.pulse_model.values(1))
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,157 @@
+import functools
+import numpy as np
+from Backend import SAMPLES, Omega_Smooth
+from Propagator import Chain_Product, Propagate_States, Step_Hamiltonians
+
+# Open-system (Lindblad) propagator for the 3-level Lambda system.
+#
+# The intermediate level |2> decays by spontaneous emission to |1> at rate
+# Gamma_1 and to |3> at rate Gamma_3, and every coherence between levels
+# decays at the pure dephasing rate dephasing. The density matrix is stored
+# row-major as a 9-vector, vec(rho)[3 i + j] = rho_ij, so that
+# vec(A rho B) = (A kron B^T) vec(rho) and the master equation becomes
+# d vec(rho)/dt = L vec(rho) with a 9x9 Liouvillian.
+#
+# As in Propagator.py the pulses are piecewise constant over each interval
+# (midpoint value). L is affine in the two pulse amplitudes,
+# L = L_0 + Omega_P L_P + Omega_S L_S, where the three 9x9 terms are built
+# once per parameter set; every step superoperator exp(L dt) is then one
+# batched matrix exponential, and the steps are chained with the same blocked
+# scan as the pure-state propagator. Leading batch dimensions on the pulse
+# arrays are carried through. With all rates zero the step superoperators are
+# U kron U^* of the closed-system steps, so the populations agree with
+# Propagate to rounding.
+
+
+def _Commutator(H):
+    # -i [H, rho] for a real-symmetric H
+    return -1j * (np.kron(H, np.eye(3)) - np.kron(np.eye(3), H.T))
+
+
+def _Dissipator(C):
+    # C rho C^dagger - {C^dagger C, rho} / 2
+    CdC = C.conj().T @ C
+    return np.kron(C, C.conj()) - 0.5 * (np.kron(CdC, np.eye(3)) + np.kron(np.eye(3), CdC.T))
+
+
+@functools.lru_cache(maxsize=32)
+def Liouvillian_Terms(E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5, Omega_S=4.5, Gamma_1=0.0, Gamma_3=0.0, dephasing=0.0):
+    """(L_0, L_P, L_S), the static and per-unit-pulse parts of the Liouvillian
+
+    The returned arrays are shared between callers and read-only.
+    """
+    # Same matrices as Step_Hamiltonians for zero pulses and for unit pulses
+    H_0, H_P, H_S = Step_Hamiltonians(np.array([[0.0, 0.0], [1.0, 1.0], [0.0, 0.0]]),
+                                      np.array([[0.0, 0.0], [0.0, 0.0], [1.0, 1.0]]),
+                                      E1, E2, E3, Omega_P, Omega_S)[:, 0]
+    H_P, H_S = H_P - H_0, H_S - H_0
+
+    L_0 = _Commutator(H_0)
+    Lower = np.zeros((3, 3))
+    for level, rate in ((0, Gamma_1), (2, Gamma_3)):
+        Lower[:] = 0.0
+        Lower[level, 1] = np.sqrt(rate)
+        L_0 = L_0 + _Dissipator(Lower)
+    for level in range(3):
+        Projector = np.zeros((3, 3))
+        Projector[level, level] = np.sqrt(dephasing)
+        L_0 = L_0 + _Dissipator(Projector)
+
+    Terms = (L_0, _Commutator(H_P), _Commutator(H_S))
+    for Term in Terms:
+        Term.setflags(write=False)
+    return Terms
+
+
+def Step_Superoperators(Omega_P1_Smooth, Omega_S1_Smooth, tlist, **params):
+    """exp(L dt) for every interval of tlist, shape (..., len(tlist) - 1, 9, 9)"""
+    from scipy.linalg import expm
+
+    L_0, L_P, L_S = Liouvillian_Terms(**params)
+    Omega_P1_Smooth = np.asarray(Omega_P1_Smooth, dtype=float)
+    Omega_S1_Smooth = np.asarray(Omega_S1_Smooth, dtype=float)
+    Omega_P_Mid = 0.5 * (Omega_P1_Smooth[..., 1:] + Omega_P1_Smooth[..., :-1])
+    Omega_S_Mid = 0.5 * (Omega_S1_Smooth[..., 1:] + Omega_S1_Smooth[..., :-1])
+    dt = np.diff(np.asarray(tlist, dtype=float))[..., None, None]
+
+    return expm(dt * (L_0 + Omega_P_Mid[..., None, None] * L_P + Omega_S_Mid[..., None, None] * L_S))
+
+
+def Open_Propagate(Omega_P1_Smooth, Omega_S1_Smooth, tlist, **params):
+    """Populations of levels 1-3 over tlist, starting in level 1; shape (..., 3, len(tlist))
+
+    params are the Hamiltonian parameters E1 ... Omega_S and the rates
+    Gamma_1, Gamma_3 and dephasing.
+    """
+    Rho_0 = np.zeros(9)
+    Rho_0[0] = 1.0
+    States = Propagate_States(Step_Superoperators(Omega_P1_Smooth, Omega_S1_Smooth, tlist, **params), Rho_0)
+    return np.swapaxes(States[..., [0, 4, 8]].real, -1, -2)
+
+
+def Open_Final_Populations(Omega_P1_Smooth, Omega_S1_Smooth, tlist, **params):
+    """Populations of levels 1-3 at the end of tlist only, shape (..., 3)"""
+    Total = Chain_Product(Step_Superoperators(Omega_P1_Smooth, Omega_S1_Smooth, tlist, **params))
+    # Starting from |1><1|, the final state is the first column
+    return Total[..., [0, 4, 8], 0].real
+
+
+def Simulate_Open_Batch(Pump_Knots, Stokes_Knots, T_end=9, chunk_size=16, samples=SAMPLES, **params):
+    """Final level-3 populations of N pump/Stokes pairs in slider format, with decay
+
+    The open-system counterpart of Propagator.Simulate_Batch; chunks are
+    smaller because every step holds a 9x9 superoperator.
+    """
+    Pump_Knots = np.atleast_2d(np.asarray(Pump_Knots, dtype=float))
+    Stokes_Knots = np.atleast_2d(np.asarray(Stokes_Knots, dtype=float))
+    t = np.linspace(0, T_end, samples)
+
+    Final = np.empty(len(Pump_Knots))
+    for start in range(0, len(Pump_Knots), chunk_size):
+        stop = min(start + chunk_size, len(Pump_Knots))
+        Final[start:stop] = Open_Final_Populations(Omega_Smooth(Pump_Knots[start:stop], T_end, samples),
+                                                   Omega_Smooth(Stokes_Knots[start:stop], T_end, samples),
+                                                   t, **params)[:, 2]
+    return Final
+
+
+if __name__ == "__main__":
+    # Closed-system limit, agreement with qutip.mesolve under decay, and timing
+    import timeit
+    import qutip
+    from Backend import Basis, Hamiltonian
+    from Propagator import Propagate
+
+    T_end = 9
+    t = np.linspace(0, T_end, SAMPLES)
+    x_values = np.linspace(0, 2 * np.pi, 10)
+    Gaussian = np.exp(-(x_values - np.mean(x_values)) ** 2 / 2)
+    Omega_P1_Smooth = Omega_Smooth(Gaussian, T_end)
+    Omega_S1_Smooth = Omega_Smooth(Gaussian, T_end)
+
+    print("Zero rates vs closed system: %.2e" % np.max(np.abs(
+        Open_Propagate(Omega_P1_Smooth, Omega_S1_Smooth, t) - Propagate(Omega_P1_Smooth, Omega_S1_Smooth, t))))
+
+    rates = dict(Gamma_1=0.3, Gamma_3=0.2, dephasing=0.1)
+    Kets, Projectors = Basis()
+    c_ops = [np.sqrt(rates["Gamma_1"]) * Kets[0] * Kets[1].dag(), np.sqrt(rates["Gamma_3"]) * Kets[2] * Kets[1].dag()]
+    c_ops += [np.sqrt(rates["dephasing"]) * Projector for Projector in Projectors]
+    Reference = qutip.mesolve(Hamiltonian(Omega_P1_Smooth, Omega_S1_Smooth), Kets[0], t, c_ops, list(Projectors))
+    Open = Open_Propagate(Omega_P1_Smooth, Omega_S1_Smooth, t, **rates)
+    print("Decay %s vs mesolve: %.2e, final level-3 population %.4f" % (
+        rates, np.max(np.abs(Open - np.array(Reference.expect))), Open[2, -1]))
+
+    n = 20
+    seconds = timeit.timeit(lambda: Open_Propagate(Omega_P1_Smooth, Omega_S1_Smooth, t, **rates), number=n) / n
+    print("Open-system propagation: %.2f ms per solve" % (seconds * 1e3))
+    seconds = timeit.timeit(lambda: qutip.mesolve(Hamiltonian(Omega_P1_Smooth, Omega_S1_Smooth), Kets[0], t, c_ops,
+                                                  list(Projectors)), number=3) / 3
+    print("qutip.mesolve with collapse operators: %.2f ms per solve" % (seconds * 1e3))
+
+    rng = np.random.default_rng(0)
+    Pump_Knots = np.zeros((256, T_end + 1))
+    Stokes_Knots = np.zeros((256, T_end + 1))
+    Pump_Knots[:, 1:-1] = rng.uniform(-1, 1, (256, 8))
+    Stokes_Knots[:, 1:-1] = rng.uniform(-1, 1, (256, 8))
+    seconds = timeit.timeit(lambda: Simulate_Open_Batch(Pump_Knots, Stokes_Knots, T_end, **rates), number=1)
+    print("Open-system batch scoring: %.0f pulse pairs per second" % (len(Pump_Knots) / seconds))
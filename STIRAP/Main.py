@@ -1,85 +1,128 @@
 import sys
+import threading
+import time
 import numpy as np
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.lines import Line2D
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QLabel, QSlider, QPushButton, QComboBox, QLineEdit, QMessageBox, QFormLayout
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
-from scipy.interpolate import splrep, BSpline
-import krotov
-import qutip
-from qutip import Qobj
-import matplotlib.pylab as plt
-from scipy.interpolate import splrep, BSpline
-from qutip import Qobj
-import requests
-
-def Omega_P2_Guess(t, args):
-    """Guess for the imaginary part of the pump pulse"""
-    return 0.0
-
-def Omega_S2_Guess(t, args):
-    """Guess for the imaginary part of the Stokes pulse"""
-    return 0.0
-
-def Hamiltonian(Omega_P1_Smooth, Omega_S1_Smooth, E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5, Omega_S=4.5):
-    """Lambda-system Hamiltonian in the RWA"""
-
-    # detunings
-    P = E1 + Omega_P - E2
-    S = E3 + Omega_S - E2
-
-    H_0 = Qobj([[P, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, S]])
-
-    HP_Re = -0.5 * Qobj([[0.0, 1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 0.0]])
-    HP_Im = -0.5 * Qobj([[0.0, 1.0j, 0.0], [-1.0j, 0.0, 0.0], [0.0, 0.0, 0.0]])
-
-    HS_Re = -0.5 * Qobj([[0.0, 0.0, 0.0], [0.0, 0.0, 1.0], [0.0, 1.0, 0.0]])
-    HS_Im = -0.5 * Qobj([[0.0, 0.0, 0.0], [0.0, 0.0, 1.0j], [0.0, -1.0j, 0.0]])
-
-    return [
-        H_0,
-        [HP_Re, Omega_P1_Smooth],
-        [HP_Im, Omega_P2_Guess],
-        [HS_Re, Omega_S1_Smooth],
-        [HS_Im, Omega_S2_Guess],
-    ]
-
-def RWA_Target_State(Ket_3, E2=10.0, Omega_S=4.5, T=5):
-    return np.exp(1j * (E2 - Omega_S) * T) * Ket_3
-
-def Plot_Pulses(pulse, tlist, label):
-    fig, ax = plt.subplots()
+from matplotlib.figure import Figure
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QLabel, QSlider, QPushButton, QComboBox, QLineEdit, QMessageBox, QFormLayout, QCheckBox, QShortcut
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QPixmap, QFont, QKeySequence
+from Rendering import BlitManager
+from PulseModel import PulseModel
+from Backend import PRESETS, SAMPLES, Basis, Operators, Preset_Knots, Score, Simulation_Session, Smoothing_Matrix
+from Optimization import Optimize_Pulses
+from Propagator import PropagatorResult
+from ResultCache import ResultCache, Cache_Key, DEFAULT_CACHE_FILE
+from Workers import SimulationWorker
+from Scoreboard import ScoreSubmitter
+from Timing import TIMINGS
+
+# Solver used by "Shoot the Lasers": "native" for the closed-form NumPy
+# propagator in Propagator.py, "lindblad" for the open-system propagator in
+# Lindblad.py with the DECAY_RATES below, "qutip" for qutip.mesolve on the
+# compiled session Hamiltonian
+SOLVER = "native"
+
+# Frame of the "qutip" solver (Backend.FRAMES): "rwa" or "interaction", which
+# moves the static H_0 into the frame; Bench_Frame.py compares the two
+FRAME = "rwa"
+
+# Spontaneous emission from level 2 to levels 1 and 3, and pure dephasing of
+# the coherences, all in the units of the Hamiltonian; "lindblad" solver only
+DECAY_RATES = dict(Gamma_1=0.0, Gamma_3=0.0, dephasing=0.0)
+
+# Time resolution of "Shoot the Lasers", shared by smoothing, solver and score:
+# a number of grid points. There is no adaptive setting: on the native solver
+# Backend.Adaptive_Final_Population is slower than the fixed grid and changes
+# more scores (Bench_Resolution.py)
+TIME_SAMPLES = SAMPLES
+
+# Live preview: while a slider moves a reduced-resolution simulation runs at
+# most once per PREVIEW_INTERVAL_MS, and a full-resolution one follows once
+# the sliders have been still for PREVIEW_SETTLE_MS
+PREVIEW_SAMPLES = 100
+PREVIEW_INTERVAL_MS = 30
+PREVIEW_SETTLE_MS = 250
+
+# Optimize mode: Krotov iterations from the current pulses stop after
+# OPTIMIZE_ITERATIONS iterations or OPTIMIZE_SECONDS, whichever comes first
+OPTIMIZE_ITERATIONS = 20
+OPTIMIZE_SECONDS = 30.0
+
+# Stage timing: with TIMING set every stage of a click and of a reset is
+# timed (Timing.py), appended as JSON lines to TIMING_LOG when it is a path,
+# and summarized as rolling percentiles in an overlay when TIMING_OVERLAY is
+# set (F12 shows or hides it)
+TIMING = False
+TIMING_LOG = None
+TIMING_OVERLAY = False
+TIMING_OVERLAY_INTERVAL_MS = 1000
+
+def Warm_Up_Physics():
+    """Import the physics stack ahead of the first click
+
+    scipy and qutip take seconds to import and are not needed to draw the
+    window, so they are imported on demand inside the functions that use them.
+    This is run on a background thread after the first paint so the first
+    "Shoot the Lasers" click does not pay for the imports or for building the
+    shared smoothing matrices and operators.
+    """
+    Smoothing_Matrix(9, TIME_SAMPLES)
+    Smoothing_Matrix(9, PREVIEW_SAMPLES)
+    if SOLVER == "qutip":
+        Basis()
+        Operators()
+
+def Plot_Pulses(pulse, tlist, label, line):
+    """Show a pulse on an existing line artist instead of a new figure"""
     if callable(pulse):
         pulse = np.array([pulse(t, args=None) for t in tlist])
-    ax.plot(tlist, pulse)
-    ax.set_xlabel('time')
-    ax.set_ylabel('%s pulse amplitude' % label)
-    #plt.show() 
-
-def Plot_Population(result):
-    fig, ax = plt.subplots()
-    ax.plot(result.times, result.expect[0], label='1')
-    ax.plot(result.times, result.expect[1], label='2')
-    ax.plot(result.times, result.expect[2], label='3')
-    ax.legend()
-    ax.set_xlabel('time')
-    ax.set_ylabel('population')
-    plt.show()
-
-def Omega_Smooth(Omega_Inputs, T_end):
-    # Pre-established Time-Domain
-    T_axis = np.arange(0, T_end + 1)
-
-    # Random Values given by User
-    tck = splrep(T_axis, Omega_Inputs, s=0)
-
-    # Making the random values into Smooth Function (time below is also pre-established)
-    t_smooth = np.linspace(0, T_end, 500)
-    Pulse_smooth = BSpline(*tck)(t_smooth)
-
-    return Pulse_smooth
+    line.set_data(tlist, pulse)
+    line.set_label('%s pulse amplitude' % label)
+
+def Shoot_The_Lasers(Pump_Knots, Stokes_Knots, check_cancelled, T_end=9, cache=None, samples=None):
+    """Smooth the slider knots and solve the system, off the GUI thread
+
+    check_cancelled() is called between stages so a superseded click stops
+    early. samples defaults to TIME_SAMPLES. Repeated pulses are answered
+    from cache when one is given. Returns
+    (t, Omega_P1_Smooth, Omega_S1_Smooth, Guess_Dynamics).
+    """
+    if samples is None:
+        samples = TIME_SAMPLES
+
+    # Operators, basis states and the compiled Hamiltonian live in the session
+    if SOLVER == "lindblad":
+        session = Simulation_Session(T_end, samples, **DECAY_RATES)
+        # The rates change the result, so they are part of the cache key
+        solver = "lindblad %(Gamma_1)r %(Gamma_3)r %(dephasing)r" % DECAY_RATES
+    else:
+        session = Simulation_Session(T_end, samples)
+        solver = SOLVER
+    t = session.tlist
+
+    #We smooth the Values
+    with TIMINGS.span("smooth"):
+        Omega_P1_Smooth, Omega_S1_Smooth = session.smooth(Pump_Knots, Stokes_Knots)
+    check_cancelled()
+
+    if cache is not None:
+        with TIMINGS.span("cache_lookup"):
+            key = Cache_Key(Pump_Knots, Stokes_Knots, T_end, solver, samples)
+            cached = cache.get(key)
+        if cached is not None:
+            times, populations, _ = cached
+            return t, Omega_P1_Smooth, Omega_S1_Smooth, PropagatorResult(times, populations)
+
+    ##We Solve the System
+    with TIMINGS.span("solve"):
+        Guess_Dynamics = session.solve(Omega_P1_Smooth, Omega_S1_Smooth, SOLVER, FRAME)
+
+    check_cancelled()
+    if cache is not None:
+        with TIMINGS.span("cache_store"):
+            cache.put(key, t, np.array(Guess_Dynamics.expect), Score(Guess_Dynamics))
+    return t, Omega_P1_Smooth, Omega_S1_Smooth, Guess_Dynamics
 
 # Custom Slider class with custom styles
 class Slider(QSlider):
@@ -169,7 +212,7 @@ class AdjustablePlots(QMainWindow):
 
         # Create a vertical layout for the initial plots on the left
         left_plots_layout = QVBoxLayout()
-        self.canvas = FigureCanvas(plt.figure())
+        self.canvas = FigureCanvas(Figure())
         left_plots_layout.addWidget(self.canvas)
 
         # Create two subplots for the initial plots
@@ -191,20 +234,22 @@ class AdjustablePlots(QMainWindow):
         self.y_values1 = [0.0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
         self.y_values2 = [0.0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
 
-        # Initialize the plots with initial data points
-        self.plot1, = self.ax1.plot(self.x_values, self.y_values1, 'bo')
-        self.plot2, = self.ax2.plot(self.x_values, self.y_values2, 'bo')
+        # Initialize the plots with initial data points, each pulse is one
+        # polyline artist through its knots
+        self.plot1, = self.ax1.plot(self.x_values, self.y_values1, 'bo-', lw=1)
+        self.plot2, = self.ax2.plot(self.x_values, self.y_values2, 'bo-', lw=1)
 
-        # Create lines to connect the points on the plots
-        self.lines1 = [Line2D([], [], linestyle='-', color='blue', lw=1) for _ in range(9)]  # Adjusted to 7 lines
-        self.lines2 = [Line2D([], [], linestyle='-', color='blue', lw=1) for _ in range(9)]  # Adjusted to 7 lines
+        # Smoothed pulses of the last shot, drawn over the knots and reused every click
+        self.smooth_line1, = self.ax1.plot([], [], linestyle='--', color='orange', lw=1)
+        self.smooth_line2, = self.ax2.plot([], [], linestyle='--', color='orange', lw=1)
 
-        # Add lines to the plots
-        for line in self.lines1:
-            self.ax1.add_line(line)
+        # Slider changes only repaint the pulse artists over a cached background
+        self.blit_manager = BlitManager(self.canvas, [self.plot1, self.plot2])
 
-        for line in self.lines2:
-            self.ax2.add_line(line)
+        # Knot values of both pulses; sliders and presets write here and the
+        # plots and live preview follow its coalesced change notifications
+        self.pulse_model = PulseModel(len(self.x_values))
+        self.pulse_model.changed.connect(self.on_pulses_changed)
 
         # Update lines with initial coordinates
         self.update_lines()
@@ -226,6 +271,19 @@ class AdjustablePlots(QMainWindow):
         sliders_button_layout.addWidget(button, alignment=Qt.AlignCenter)
         button.setEnabled(False)
 
+        # Optional continuously updated population plots while sliding
+        self.preview_checkbox = QCheckBox("Live Preview")
+        self.preview_checkbox.toggled.connect(self.schedule_preview)
+        sliders_button_layout.addWidget(self.preview_checkbox, alignment=Qt.AlignCenter)
+
+        # Krotov optimization of the current pulses; the same button cancels it
+        self.optimizing = False
+        self.optimize_button = QPushButton("Optimize")
+        self.optimize_button.clicked.connect(self.optimize_button_click)
+        sliders_button_layout.addWidget(self.optimize_button, alignment=Qt.AlignCenter)
+        self.optimize_label = QLabel("")
+        sliders_button_layout.addWidget(self.optimize_label, alignment=Qt.AlignCenter)
+
         control_label = QLabel("Make your Laser Pulse!")
         sliders_button_layout.addWidget(control_label, alignment=Qt.AlignCenter)
 
@@ -237,7 +295,7 @@ class AdjustablePlots(QMainWindow):
 
         # Create a vertical layout for the new plots on the right
         new_plots_layout = QVBoxLayout()
-        self.canvas2 = FigureCanvas(plt.figure())
+        self.canvas2 = FigureCanvas(Figure())
         new_plots_layout.addWidget(self.canvas2)
 
         # Create three new subplots for the new plots
@@ -267,6 +325,74 @@ class AdjustablePlots(QMainWindow):
 
         central_widget.setLayout(main_layout)
 
+        # Simulations run on a background thread and report back here
+        self.simulation_worker = SimulationWorker()
+        self.simulation_worker.finished.connect(self.on_simulation_finished)
+        self.simulation_worker.failed.connect(self.on_simulation_failed)
+
+        # Previews get their own worker so they never supersede a scored click
+        self.preview_worker = SimulationWorker()
+        self.preview_worker.finished.connect(self.on_preview_finished)
+        self.preview_worker.failed.connect(self.on_preview_failed)
+
+        # Optimization streams every iteration back through progress
+        self.optimization_worker = SimulationWorker()
+        self.optimization_worker.progress.connect(self.on_optimization_progress)
+        self.optimization_worker.finished.connect(self.on_optimization_finished)
+        self.optimization_worker.failed.connect(self.on_optimization_failed)
+
+        # Throttles coarse previews while dragging, debounces the full-resolution one
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_INTERVAL_MS)
+        self.preview_timer.timeout.connect(lambda: self.run_preview(PREVIEW_SAMPLES))
+
+        self.refine_timer = QTimer(self)
+        self.refine_timer.setSingleShot(True)
+        self.refine_timer.setInterval(PREVIEW_SETTLE_MS)
+        self.refine_timer.timeout.connect(lambda: self.run_preview(None))
+
+        # High scores go through a persistent outbox to the scoreboard
+        self.score_submitter = ScoreSubmitter()
+
+        # Results of repeated pulses, persisted between sessions (loaded in warm_up)
+        self.result_cache = ResultCache(path=DEFAULT_CACHE_FILE)
+
+        self.click_started = None
+        if TIMING:
+            TIMINGS.configure(enabled=True, log_path=TIMING_LOG)
+            # Deferred redraws (draw_idle) are timed where they actually happen
+            self.canvas.draw = TIMINGS.wrap("draw_pulses", self.canvas.draw)
+            self.canvas2.draw = TIMINGS.wrap("draw_populations", self.canvas2.draw)
+        if TIMING and TIMING_OVERLAY:
+            self.create_timing_overlay()
+
+    # Method to create the floating timing overlay and its refresh timer
+    def create_timing_overlay(self):
+        self.timing_overlay = QLabel(self)
+        self.timing_overlay.setFont(QFont("Monospace", 9))
+        self.timing_overlay.setStyleSheet("background: rgba(255, 255, 255, 220); border: 1px solid #999999;")
+        self.timing_overlay.move(10, 10)
+        self.timing_overlay.raise_()
+
+        self.timing_overlay_timer = QTimer(self)
+        self.timing_overlay_timer.setInterval(TIMING_OVERLAY_INTERVAL_MS)
+        self.timing_overlay_timer.timeout.connect(self.update_timing_overlay)
+        self.timing_overlay_timer.start()
+
+        QShortcut(QKeySequence("F12"), self, activated=lambda: self.timing_overlay.setVisible(
+            not self.timing_overlay.isVisible()))
+
+    def update_timing_overlay(self):
+        if self.timing_overlay.isVisible():
+            self.timing_overlay.setText(TIMINGS.report())
+            self.timing_overlay.adjustSize()
+
+    # Background start-up work, run after the first paint
+    def warm_up(self):
+        Warm_Up_Physics()
+        self.result_cache.load()
+
 
     def create_sliders(self):
         self.plot1_layout = QVBoxLayout()
@@ -300,7 +426,7 @@ class AdjustablePlots(QMainWindow):
                     slider.setEnabled(False)  # Disable sliders for constant data points
                 else:
                     slider.setValue(int(y_values[j - 1] * 100))  # Set the initial value based on y_values
-                slider.valueChanged.connect(lambda val, plot=plot, index=j - 1: self.update_slider(val, plot, index))
+                slider.valueChanged.connect(lambda val, pulse=i, index=j: self.update_slider(val, pulse, index))
                 sliders_layout.addWidget(slider)  # Add the slider to the layout
                 sliders.append(slider)  # Add the slider to the list
 
@@ -325,89 +451,118 @@ class AdjustablePlots(QMainWindow):
     # Method to create dropdown menus for each plot
     def create_dropdowns(self):
         self.dropdown1 = QComboBox()
-        self.dropdown1.addItems(["Free Hand", "Sin Wave", "Cos Wave", "Gaussian"])
+        self.dropdown1.addItems(["Free Hand", *PRESETS])
         self.dropdown1.currentIndexChanged.connect(self.update_dropdown1)
 
         self.dropdown2 = QComboBox()
-        self.dropdown2.addItems(["Free Hand", "Sin Wave", "Cos Wave", "Gaussian"])
+        self.dropdown2.addItems(["Free Hand", *PRESETS])
         self.dropdown2.currentIndexChanged.connect(self.update_dropdown2)
 
     # Method to update plot and sliders based on dropdown selection for Plot 1
     def update_dropdown1(self):
         selected_option = self.dropdown1.currentText()
-        if selected_option == "Free Hand":
-            pass
-        elif selected_option == "Sin Wave":
-            self.y_values1 = np.sin(self.x_values)
-        elif selected_option == "Cos Wave":
-            self.y_values1 = np.cos(self.x_values)
-            self.y_values1[0] = 0
-            self.y_values1[9] = 0
-        elif selected_option == "Gaussian":
-            self.y_values1 = np.exp(-(self.x_values - np.mean(self.x_values)) ** 2 / (2 * 1 ** 2))  # Gaussian with mean at x middle
-
-        for slider, y_value in zip(self.sliders1, self.y_values1):
-            slider.setValue(int(y_value * 100))
-
-        self.plot1.set_ydata(self.y_values1)
-        self.update_lines()
-        self.canvas.draw_idle()
+        if selected_option != "Free Hand":
+            self.y_values1 = Preset_Knots(selected_option, 0, len(self.x_values))
+
+        self.apply_preset(0, self.y_values1, self.sliders1)
 
     # Method to update plot and sliders based on dropdown selection for Plot 2
     def update_dropdown2(self):
         selected_option = self.dropdown2.currentText()
-        if selected_option == "Free Hand":
-            pass
-        elif selected_option == "Sin Wave":
-            self.y_values2 = np.sin(self.x_values)
-        elif selected_option == "Cos Wave":
-            self.y_values2 = np.cos(self.x_values)
-        elif selected_option == "Gaussian":
-            self.y_values2 = np.exp(-(self.x_values - np.mean(self.x_values)) ** 2 / (2 * 1 ** 2))  # Gaussian with mean at x middle
-
-        for slider, y_value in zip(self.sliders2, self.y_values2):
-            slider.setValue(int(y_value * 100))
-
-        self.plot2.set_ydata(self.y_values2)
-        self.update_lines()
-        self.canvas.draw_idle()
+        if selected_option != "Free Hand":
+            self.y_values2 = Preset_Knots(selected_option, 1, len(self.x_values))
+
+        self.apply_preset(1, self.y_values2, self.sliders2)
+
+    # Method to move a pulse's sliders and knots to a preset in one model update
+    def apply_preset(self, pulse, y_values, sliders):
+        with self.pulse_model.batch():
+            for slider, y_value in zip(sliders, y_values):
+                slider.setValue(int(y_value * 100))
+            # Keep the unrounded preset values rather than the slider steps
+            self.pulse_model.set_values(pulse, y_values)
+
+    def update_slider(self, val, pulse, index):
+        self.pulse_model.set_value(pulse, index, val / 100.0)  # Update the corresponding knot value
+
+    # Method to follow model changes: once per slider tick or per preset/reset
+    def on_pulses_changed(self, pulses):
+        plots = [[self.plot1, self.plot2][pulse] for pulse in pulses]
+        for pulse, plot in zip(pulses, plots):
+            plot.set_ydata(self.pulse_model.values(pulse))
+
+        self.update_lines(plots)  # Repaint only the changed pulses
+
+        self.schedule_preview()
+
+    # Method to queue a live preview after a pulse change
+    def schedule_preview(self):
+        if not self.preview_checkbox.isChecked():
+            self.preview_timer.stop()
+            self.refine_timer.stop()
+            self.preview_worker.cancel()
+            return
 
-    def update_slider(self, val, plot, index):
-        y_values = plot.get_ydata()  # Get the current y-values of the plot
-        y_values[index + 1] = val / 100.0  # Update the corresponding y-value based on the slider value
-        plot.set_ydata(y_values)  # Set the updated y-values to the plot
+        if not self.preview_timer.isActive():
+            self.preview_timer.start()
+        self.refine_timer.start()
 
-        self.update_lines()  # Update the lines connecting the points on the plot
+    # Method to simulate the current pulses on the preview worker; samples=None
+    # runs at the full TIME_SAMPLES resolution, and only those results are cached
+    def run_preview(self, samples):
+        Pump_Knots = self.pulse_model.values(0)
+        Stokes_Knots = self.pulse_model.values(1)
+        cache = self.result_cache if samples is None else None
 
-        self.canvas.draw_idle()  # Redraw the plot canvas
+        self.preview_worker.submit(
+            lambda check_cancelled: Shoot_The_Lasers(Pump_Knots, Stokes_Knots, check_cancelled,
+                                                     cache=cache, samples=samples))
 
+    # Method to show a preview result; previews never change the score
+    def on_preview_finished(self, request_id, result):
+        if not self.preview_worker.is_current(request_id) or not self.preview_checkbox.isChecked():
+            return
 
-    def update_lines(self):
-        for i, (plot, lines) in enumerate([(self.plot1, self.lines1), (self.plot2, self.lines2)]):
-            x_values = self.x_values
-            y_values = plot.get_ydata()
+        self.update_population_plots(result[3])
 
-            for j, line in enumerate(lines):
-                if j < len(lines) - 1:  # Adjusted the range to include all points
-                    x_data = x_values[j:j + 2]  # Connect adjacent points
-                    y_data = y_values[j:j + 2]
-                else:
-                    x_data = x_values[-2:]  # Connect the last two points
-                    y_data = y_values[-2:]
+    def on_preview_failed(self, request_id, error):
+        if not self.preview_worker.is_current(request_id) or not self.preview_checkbox.isChecked():
+            return
+        # Turn the preview off so a failing pulse does not raise a warning per tick
+        self.preview_checkbox.setChecked(False)
+        QMessageBox.warning(self, "Warning", "The live preview failed and was turned off: %s" % error)
 
-                line.set_data(x_data, y_data)  # Update the line with the new coordinates
 
-        self.canvas.draw_idle()  # Redraw the plot canvas
+    # Method to repaint the pulse polylines (all of them by default)
+    def update_lines(self, plots=None):
+        self.blit_manager.update(plots)
 
 
     def reset_button_click(self):
+        with TIMINGS.span("reset"):
+            self.reset_session()
 
+    def reset_session(self):
         self.name_button.setEnabled(True)
-            # Reset the sliders to their default values (0.0)
-        for slider in self.sliders1 + self.sliders2:
-            slider.setValue(0)
+        if self.optimizing:
+            self.optimization_worker.cancel()
+            self.stop_optimization("")
+        # Drop simulations still in flight, so a result of the departing
+        # player cannot land on the next session's score or plots
+        self.simulation_worker.cancel()
+        self.preview_timer.stop()
+        self.refine_timer.stop()
+        self.preview_worker.cancel()
+        # Reset the sliders to their default values (0.0), as one model update
+        with self.pulse_model.batch():
+            for slider in self.sliders1 + self.sliders2:
+                slider.setValue(0)
+            self.pulse_model.set_values(0, np.zeros(len(self.x_values)))
+            self.pulse_model.set_values(1, np.zeros(len(self.x_values)))
     
-        # Clear the plots on the right
+        # Clear the smoothed pulses and the plots on the right
+        self.smooth_line1.set_data([], [])
+        self.smooth_line2.set_data([], [])
         self.plot3.set_data([], [])
         self.plot4.set_data([], [])
         self.plot5.set_data([], [])
@@ -421,8 +576,9 @@ class AdjustablePlots(QMainWindow):
     
         self.canvas.draw_idle()  # Redraw the left plots
 
-        Stringbuilder = "https://gmscoreboard.com/api/set-score/?tagid=94b47096b96f2864e21376a548822b09&player=" + self.user_name + "&score=" + str(self.highScore)
-        response = requests.get(Stringbuilder)
+        # Queued to disk and delivered in the background, never blocks the kiosk
+        with TIMINGS.span("scoreboard_queue"):
+            self.score_submitter.submit(self.user_name, self.highScore)
         self.user_name = ""
         self.currentScore = 0
         self.highScore = 0
@@ -442,39 +598,25 @@ class AdjustablePlots(QMainWindow):
 
     # Method to handle button click event
     def on_button_click(self):
+        # The model hands out copies, safe to use on the worker thread
+        Pump_Knots = self.pulse_model.values(0)
+        Stokes_Knots = self.pulse_model.values(1)
+
+        # Run on the worker thread; a newer click supersedes this one
+        self.click_started = time.perf_counter()
+        self.simulation_worker.submit(
+            lambda check_cancelled: Shoot_The_Lasers(Pump_Knots, Stokes_Knots, check_cancelled, cache=self.result_cache))
+
+    # Method to receive a finished simulation from the worker thread
+    def on_simulation_finished(self, request_id, result):
+        if not self.simulation_worker.is_current(request_id):
+            return
 
-
-        # Sending the data from the plot to the backend function
-        # User Inputs Random Values
-        T_end = 9
-
-        #We smooth the Values
-        Omega_P1_Smooth = Omega_Smooth(self.plot1.get_ydata(), T_end)
-        Omega_S1_Smooth = Omega_Smooth(self.plot2.get_ydata(), T_end)
-
-        ##We Solve the System
-        H = Hamiltonian(Omega_P1_Smooth, Omega_S1_Smooth)
-
-        Ket_1 = qutip.Qobj(np.array([1.0, 0.0, 0.0]))
-        Ket_2 = qutip.Qobj(np.array([0.0, 1.0, 0.0]))
-        Ket_3 = qutip.Qobj(np.array([0.0, 0.0, 1.0]))
-
-        Proj_1 = qutip.ket2dm(Ket_1)
-        Proj_2 = qutip.ket2dm(Ket_2)
-        Proj_3 = qutip.ket2dm(Ket_3)
-
-        # Target State Definition
-        Psi_Target = RWA_Target_State(Ket_3)
-
-        # Instantiating Control Objective
-        Objective = krotov.Objective(initial_state=Ket_1, target=Psi_Target, H=H)
+        t, Omega_P1_Smooth, Omega_S1_Smooth, Guess_Dynamics = result
 
         # Show Pulse Plots
-        t = np.linspace(0, T_end, 500)
-        Plot_Pulses(H[1][1], t, 'Ωₚ')
-        Plot_Pulses(H[3][1], t, 'Ωₛ')
-
-        Guess_Dynamics = Objective.mesolve(t, e_ops=[Proj_1, Proj_2, Proj_3])
+        with TIMINGS.span("plot_pulses"):
+            self.update_smooth_pulses(t, Omega_P1_Smooth, Omega_S1_Smooth)
 
         #print("-----------------------------")
         #percentage1 = "{:.2f}%".format(Guess_Dynamics.expect[0][499] * 100)
@@ -486,12 +628,84 @@ class AdjustablePlots(QMainWindow):
         #print(f"Percentage of Level 3: {percentage3}")
         #print("-----------------------------")
 
-        self.currentScore = int(Guess_Dynamics.expect[2][499] * 100)
+        self.currentScore = Score(Guess_Dynamics)
 
         if self.currentScore > int(self.highScore):
             self.highScore = self.currentScore
 
-        self.update_population_plots(Guess_Dynamics)
+        with TIMINGS.span("plot_populations"):
+            self.update_population_plots(Guess_Dynamics)
+        # From the click to the plots being updated; the redraw follows as draw_*
+        TIMINGS.record("click", time.perf_counter() - self.click_started)
+
+    def on_simulation_failed(self, request_id, error):
+        if not self.simulation_worker.is_current(request_id):
+            return
+        QMessageBox.warning(self, "Warning", "The simulation failed: %s" % error)
+
+    # Method to start optimizing the current pulses, or to cancel a running optimization
+    def optimize_button_click(self):
+        if self.optimizing:
+            self.optimization_worker.cancel()
+            self.stop_optimization("Optimization cancelled")
+            return
+
+        Pump_Knots = self.pulse_model.values(0)
+        Stokes_Knots = self.pulse_model.values(1)
+
+        self.optimizing = True
+        self.optimize_button.setText("Cancel Optimization")
+        self.optimize_label.setText("Optimizing...")
+        self.optimization_worker.submit(
+            lambda check_cancelled: Optimize_Pulses(Pump_Knots, Stokes_Knots, check_cancelled,
+                                                    report=self.optimization_worker.report,
+                                                    iter_stop=OPTIMIZE_ITERATIONS, time_budget=OPTIMIZE_SECONDS))
+
+    # Method to show one optimization iteration; optimized pulses never change the score
+    def on_optimization_progress(self, request_id, record):
+        if not self.optimization_worker.is_current(request_id):
+            return
+
+        self.update_smooth_pulses(record.times, record.Omega_P1, record.Omega_S1)
+        self.update_population_plots(record.dynamics)
+        self.optimize_label.setText("Iteration %d: fidelity %.1f%% (%.0f ms, %.0f ms propagating)" % (
+            record.iteration, record.fidelity * 100, record.seconds * 1e3, record.propagation_seconds * 1e3))
+
+    def on_optimization_finished(self, request_id, records):
+        if not self.optimization_worker.is_current(request_id):
+            return
+
+        seconds = sum(record.seconds for record in records)
+        self.stop_optimization("Optimized to %.1f%% in %d iterations (%.1f s)" % (
+            records[-1].fidelity * 100, records[-1].iteration, seconds))
+
+    def on_optimization_failed(self, request_id, error):
+        if not self.optimization_worker.is_current(request_id):
+            return
+
+        self.stop_optimization("")
+        QMessageBox.warning(self, "Warning", "The optimization failed: %s" % error)
+
+    def stop_optimization(self, message):
+        self.optimizing = False
+        self.optimize_button.setText("Optimize")
+        self.optimize_label.setText(message)
+
+    def closeEvent(self, event):
+        self.simulation_worker.stop()
+        self.preview_worker.stop()
+        self.optimization_worker.stop()
+        self.score_submitter.stop(timeout=1.0)
+        self.result_cache.save()
+        TIMINGS.close()
+        super().closeEvent(event)
+
+    # Method to show smoothed or optimized pulses, with time rescaled onto the knot axis
+    def update_smooth_pulses(self, t, Omega_P1_Smooth, Omega_S1_Smooth):
+        x_smooth = np.interp(t, [t[0], t[-1]], [self.x_values[0], self.x_values[-1]])
+        Plot_Pulses(Omega_P1_Smooth, x_smooth, 'Ωₚ', self.smooth_line1)
+        Plot_Pulses(Omega_S1_Smooth, x_smooth, 'Ωₛ', self.smooth_line2)
+        self.canvas.draw_idle()
 
     # Method to update the population plots on the right
     def update_population_plots(self, result):
@@ -511,10 +725,12 @@ class AdjustablePlots(QMainWindow):
         self.ax4.autoscale_view()
         self.ax5.autoscale_view()
 
-        self.canvas2.draw()
+        self.canvas2.draw_idle()  # Coalesces back-to-back preview updates
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = AdjustablePlots()
     window.show()
+    # Runs once the event loop has painted the window
+    QTimer.singleShot(0, lambda: threading.Thread(target=window.warm_up, daemon=True).start())
     sys.exit(app.exec_())
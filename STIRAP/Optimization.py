@@ -0,0 +1,220 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from Backend import PRESETS, SAMPLES, Operators, Preset_Knots, Simulation_Session
+from Propagator import Native_Solve
+
+# Krotov optimization of the player's pulses.
+#
+# Starts from the smoothed slider pulses and runs krotov.optimize_pulses on the
+# real pump and Stokes amplitudes (the imaginary parts stay at their zero
+# guess, since the sliders can only show real pulses). The functional is the
+# phase-insensitive state-to-state fidelity |<target|psi(T)>|^2, which is the
+# final level-3 population the game scores.
+#
+# After every iteration a report callback gets an IterationRecord with the
+# fidelity, the updated pulses, their population traces and timings, so the
+# GUI can stream progress; check_cancelled() is polled at the same point.
+# The run stops after iter_stop iterations or once time_budget seconds have
+# passed, whichever comes first.
+
+class IterationRecord:
+    """Progress of one Krotov iteration"""
+
+    def __init__(self, iteration, fidelity, seconds, propagation_seconds, times, Omega_P1, Omega_S1, dynamics):
+        self.iteration = iteration
+        self.fidelity = fidelity
+        # Wall time of the iteration, and the part of it spent propagating states
+        self.seconds = seconds
+        self.propagation_seconds = propagation_seconds
+        self.times = times
+        self.Omega_P1 = Omega_P1
+        self.Omega_S1 = Omega_S1
+        # Populations of the updated pulses, a PropagatorResult
+        self.dynamics = dynamics
+
+
+class EighPropagator:
+    """Krotov propagator for one time step via the eigendecomposition of H
+
+    krotov.propagators.expm goes through scipy's generic expm with Qobj
+    overhead on every step, which dominates the iteration time for a 3x3
+    system; diagonalizing the dense step Hamiltonian is over an order of
+    magnitude faster. Time spent inside the propagator is accumulated in
+    `seconds`.
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._dense = {}
+
+    def __call__(self, H, state, dt, c_ops=None, backwards=False, initialize=False):
+        from qutip import Qobj
+
+        start = time.perf_counter()
+        H_step = self._full(H[0]).copy()
+        for operator, amplitude in H[1:]:
+            H_step += amplitude * self._full(operator)
+
+        if backwards:
+            dt = -dt
+        Energies, Vectors = np.linalg.eigh(H_step)
+        U = (Vectors * np.exp(-1j * Energies * dt)) @ Vectors.conj().T
+
+        state = Qobj(U @ state.full(), dims=state.dims)
+        self.seconds += time.perf_counter() - start
+        return state
+
+    def _full(self, operator):
+        # Dense copies are kept per operator object, holding a reference so its id stays unique
+        dense = self._dense.get(id(operator))
+        if dense is None:
+            dense = self._dense[id(operator)] = (operator, operator.full())
+        return dense[1]
+
+
+def Optimize_Pulses(Pump_Knots, Stokes_Knots, check_cancelled, report=None, T_end=9, iter_stop=20,
+                    time_budget=30.0, lambda_a=1.0, samples=SAMPLES, E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5, Omega_S=4.5):
+    """Run Krotov's method from the slider knots; returns the list of IterationRecords
+
+    Iteration 0 is the guess itself. report(record) is called after every
+    iteration, on the calling thread.
+    """
+    import krotov
+
+    params = dict(E1=E1, E2=E2, E3=E3, Omega_P=Omega_P, Omega_S=Omega_S)
+    session = Simulation_Session(T_end, samples, **params)
+    t = session.tlist
+
+    Omega_P1_Guess, Omega_S1_Guess = session.smooth(Pump_Knots, Stokes_Knots)
+    H_0, HP_Re, HP_Im, HS_Re, HS_Im = Operators(**params)
+    # Krotov works in the RWA frame, where H is real and time-local
+    H = [H_0, [HP_Re, Omega_P1_Guess], [HS_Re, Omega_S1_Guess]]
+    Objective = krotov.Objective(initial_state=session.kets[0], target=session.frame_target("rwa"), H=H)
+
+    # Pulse updates fade in and out so the pulses keep starting and ending at zero
+    def Update_Shape(t):
+        return krotov.shapes.flattop(t, t_start=0, t_stop=T_end, t_rise=0.5, func='blackman')
+
+    options = dict(lambda_a=lambda_a, update_shape=Update_Shape)
+    pulse_options = {id(Omega_P1_Guess): options, id(Omega_S1_Guess): options}
+
+    propagator = EighPropagator()
+    records = []
+    start = last = time.perf_counter()
+    propagated = 0.0
+
+    def Info_Hook(**kwargs):
+        nonlocal last, propagated
+        check_cancelled()
+
+        now = time.perf_counter()
+        Psi_T = kwargs['fw_states_T'][0]
+        Omega_P1, Omega_S1 = (krotov.conversions.pulse_onto_tlist(pulse) for pulse in kwargs['optimized_pulses'])
+
+        record = IterationRecord(kwargs['iteration'], abs(session.frame_target("rwa").overlap(Psi_T)) ** 2,
+                                 now - last, propagator.seconds - propagated, t, Omega_P1, Omega_S1,
+                                 Native_Solve(Omega_P1, Omega_S1, t, **params))
+        records.append(record)
+        if report is not None:
+            report(record)
+
+        last = time.perf_counter()
+        propagated = propagator.seconds
+
+    def Check_Budget(result):
+        if time.perf_counter() - start > time_budget:
+            return "time budget of %g s reached" % time_budget
+
+    krotov.optimize_pulses(
+        [Objective],
+        pulse_options=pulse_options,
+        tlist=t,
+        propagator=[propagator],  # a list, so krotov uses this instance instead of a copy
+        chi_constructor=krotov.functionals.chis_ss,
+        info_hook=Info_Hook,
+        check_convergence=Check_Budget,
+        iter_stop=iter_stop,
+    )
+    return records
+
+
+class StartResult:
+    """One run of a multi-start optimization"""
+
+    def __init__(self, index, name, Pump_Knots, Stokes_Knots, records):
+        self.index = index
+        # "<pump preset> / <Stokes preset>" or "random <n>"
+        self.name = name
+        self.Pump_Knots = Pump_Knots
+        self.Stokes_Knots = Stokes_Knots
+        self.guess_fidelity = records[0].fidelity
+        self.fidelity = records[-1].fidelity
+        self.iterations = records[-1].iteration
+        self.seconds = sum(record.seconds for record in records)
+        # Optimized pulses on the session grid
+        self.times = records[-1].times
+        self.Omega_P1 = records[-1].Omega_P1
+        self.Omega_S1 = records[-1].Omega_S1
+
+
+def Starting_Points(seed=0, random_starts=8, knots=10):
+    """[(name, Pump_Knots, Stokes_Knots)]: every preset pair, then random knot pairs
+
+    Random knots are drawn at slider resolution from np.random.default_rng(seed).
+    """
+    starts = [("%s / %s" % (pump, stokes), Preset_Knots(pump, 0, knots), Preset_Knots(stokes, 1, knots))
+              for pump in PRESETS for stokes in PRESETS]
+
+    rng = np.random.default_rng(seed)
+    for n in range(random_starts):
+        Pump_Knots, Stokes_Knots = np.zeros((2, knots))
+        Pump_Knots[1:-1], Stokes_Knots[1:-1] = np.round(rng.uniform(-1, 1, (2, knots - 2)), 2)
+        starts.append(("random %d" % n, Pump_Knots, Stokes_Knots))
+    return starts
+
+
+def _Run_Start(start):
+    # Top-level so the process pool can pickle it
+    index, name, Pump_Knots, Stokes_Knots, options = start
+    records = Optimize_Pulses(Pump_Knots, Stokes_Knots, lambda: None, time_budget=np.inf, **options)
+    return StartResult(index, name, Pump_Knots, Stokes_Knots, records)
+
+
+def Multi_Start(seed=0, random_starts=8, iter_stop=10, lambda_a=1.0, workers=None, **params):
+    """Optimize from every starting point in parallel; returns (best, leaderboard)
+
+    Each start is an independent Optimize_Pulses run with an iteration budget
+    only (a wall-time budget would make the result depend on machine load), in
+    a process pool with one worker per core by default. The leaderboard holds
+    every StartResult, best final fidelity first with ties broken by start
+    order, so the outcome depends only on seed and the options.
+    """
+    options = dict(iter_stop=iter_stop, lambda_a=lambda_a, **params)
+    starts = [(index, name, Pump_Knots, Stokes_Knots, options)
+              for index, (name, Pump_Knots, Stokes_Knots) in enumerate(Starting_Points(seed, random_starts))]
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        results = list(pool.map(_Run_Start, starts))
+
+    leaderboard = sorted(results, key=lambda result: (-result.fidelity, result.index))
+    return leaderboard[0], leaderboard
+
+
+if __name__ == "__main__":
+    # Optimize the Gaussian preset and show where the time goes
+    x_values = np.linspace(0, 2 * np.pi, 10)
+    Gaussian = np.exp(-(x_values - np.mean(x_values)) ** 2 / 2)
+
+    print("iter  fidelity   total ms  propagation ms")
+    records = Optimize_Pulses(0.5 * Gaussian, 0.5 * Gaussian, lambda: None, iter_stop=10, report=lambda record: print(
+        "%4d  %8.4f  %9.1f  %14.1f" % (record.iteration, record.fidelity, record.seconds * 1e3,
+                                       record.propagation_seconds * 1e3)))
+
+    print()
+    start = time.perf_counter()
+    best, leaderboard = Multi_Start(seed=0, random_starts=4, iter_stop=5)
+    print("multi-start: %d runs in %.1f s on %d cores" % (len(leaderboard), time.perf_counter() - start, os.cpu_count()))
+    for result in leaderboard:
+        print("%-22s %6.1f%% -> %6.1f%%" % (result.name, result.guess_fidelity * 100, result.fidelity * 100))
@@ -0,0 +1,381 @@
+import numpy as np
+from Backend import SAMPLES, Check_Samples, Omega_Smooth, Smoothing_Matrix
+
+# Native closed-form propagator for the 3-level Lambda system.
+#
+# The pulses are treated as piecewise-constant over each interval of the time
+# grid (using the midpoint value of the interval), so every step is a 3x3
+# real-symmetric Hamiltonian whose exponential is computed exactly from its
+# closed-form eigenvalues. All steps are exponentiated in one vectorized pass
+# and chained with a blocked scan, so there is no Python loop over the 500
+# samples. Leading batch dimensions on the pulse arrays are carried through
+# every stage.
+#
+# Accuracy: on the default 500-point grid the populations agree with
+# Objective.mesolve to better than MESOLVE_TOLERANCE (absolute) for pulse
+# amplitudes up to the slider range of +-1.
+
+MESOLVE_TOLERANCE = 1e-3
+
+# Step propagators held at once by Final_Populations, over all pulses (about
+# 1 MB of complex 3x3 matrices)
+BLOCK_SIZE = 8192
+
+
+class PropagatorResult:
+    """Stand-in for the qutip Result used by the plotting code"""
+
+    def __init__(self, times, populations):
+        self.times = times
+        # One population trace per level, indexed like mesolve's expect list
+        self.expect = populations
+
+
+def Step_Hamiltonians(Omega_P1_Smooth, Omega_S1_Smooth, E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5, Omega_S=4.5):
+    """Piecewise-constant Lambda-system Hamiltonians, one per time interval"""
+
+    # detunings
+    P = E1 + Omega_P - E2
+    S = E3 + Omega_S - E2
+
+    # Midpoint amplitude of every interval
+    Omega_P1_Smooth = np.asarray(Omega_P1_Smooth, dtype=float)
+    Omega_S1_Smooth = np.asarray(Omega_S1_Smooth, dtype=float)
+    Omega_P_Mid = 0.5 * (Omega_P1_Smooth[..., 1:] + Omega_P1_Smooth[..., :-1])
+    Omega_S_Mid = 0.5 * (Omega_S1_Smooth[..., 1:] + Omega_S1_Smooth[..., :-1])
+
+    # Same matrix elements as Hamiltonian(); the imaginary guesses are zero
+    H = np.zeros(Omega_P_Mid.shape + (3, 3))
+    H[..., 0, 0] = P
+    H[..., 2, 2] = S
+    H[..., 0, 1] = H[..., 1, 0] = -0.5 * Omega_P_Mid
+    H[..., 1, 2] = H[..., 2, 1] = -0.5 * Omega_S_Mid
+
+    return H
+
+
+def Eigenvalues(H):
+    """Closed-form eigenvalues of real-symmetric 3x3 matrices, largest first"""
+    a00, a11, a22 = H[..., 0, 0], H[..., 1, 1], H[..., 2, 2]
+    a01, a02, a12 = H[..., 0, 1], H[..., 0, 2], H[..., 1, 2]
+
+    # Trigonometric solution of the characteristic cubic
+    q = (a00 + a11 + a22) / 3.0
+    p1 = a01 ** 2 + a02 ** 2 + a12 ** 2
+    p2 = (a00 - q) ** 2 + (a11 - q) ** 2 + (a22 - q) ** 2 + 2.0 * p1
+    p = np.sqrt(p2 / 6.0)
+
+    # Fully degenerate steps (H = q*I) are given a dummy scale of 1
+    scale = np.where(p > 0, p, 1.0)
+    b00, b11, b22 = (a00 - q) / scale, (a11 - q) / scale, (a22 - q) / scale
+    b01, b02, b12 = a01 / scale, a02 / scale, a12 / scale
+    r = 0.5 * (b00 * (b11 * b22 - b12 ** 2) - b01 * (b01 * b22 - b12 * b02) + b02 * (b01 * b12 - b11 * b02))
+    phi = np.arccos(np.clip(r, -1.0, 1.0)) / 3.0
+
+    Lambda_1 = q + 2.0 * p * np.cos(phi)
+    Lambda_3 = q + 2.0 * p * np.cos(phi + 2.0 * np.pi / 3.0)
+    Lambda_2 = 3.0 * q - Lambda_1 - Lambda_3
+
+    return Lambda_1, Lambda_2, Lambda_3
+
+
+def _Exp_Divided_Difference(a, b, dt):
+    """First divided difference of exp(-i x dt), stable for a close to b"""
+    x = 0.5 * dt * (a - b)
+    Sinc = np.where(x == 0, 1.0, np.sin(x) / np.where(x == 0, 1.0, x))
+    return -1j * dt * np.exp(-0.5j * dt * (a + b)) * Sinc
+
+
+def Step_Propagators(H_steps, dt):
+    """exp(-i H dt) for a stack of real-symmetric 3x3 Hamiltonians
+
+    Uses the closed-form eigenvalues and the Newton form of Sylvester's
+    formula, U = f(l1) + f[l1,l2] (H - l1) + f[l1,l2,l3] (H - l1)(H - l2),
+    regrouped as a*I + b*H + c*H^2. Divided differences keep it exact for
+    degenerate steps (e.g. zero pulses with P == S) and no eigenvectors are
+    needed.
+    """
+    dt = np.asarray(dt, dtype=float)
+    Lambda_1, Lambda_2, Lambda_3 = Eigenvalues(H_steps)
+
+    F_1 = np.exp(-1j * dt * Lambda_1)
+    F_12 = _Exp_Divided_Difference(Lambda_1, Lambda_2, dt)
+    F_23 = _Exp_Divided_Difference(Lambda_2, Lambda_3, dt)
+
+    # Second divided difference, replaced by its Taylor limit f''/2 once the
+    # eigenvalue spread is too small to divide by safely
+    Gap = Lambda_1 - Lambda_3
+    Degenerate = Gap * dt < 1e-6
+    F_123 = np.where(Degenerate, -0.5 * dt ** 2 * np.exp(-1j * dt * (Lambda_1 + Lambda_2 + Lambda_3) / 3.0),
+                     (F_12 - F_23) / np.where(Degenerate, 1.0, Gap))
+
+    a = F_1 - F_12 * Lambda_1 + F_123 * Lambda_1 * Lambda_2
+    b = F_12 - F_123 * (Lambda_1 + Lambda_2)
+    c = F_123
+
+    H_Squared = (H_steps[..., :, 0, None] * H_steps[..., None, 0, :]
+                 + H_steps[..., :, 1, None] * H_steps[..., None, 1, :]
+                 + H_steps[..., :, 2, None] * H_steps[..., None, 2, :])
+
+    return a[..., None, None] * np.eye(3) + b[..., None, None] * H_steps + c[..., None, None] * H_Squared
+
+
+def Propagate_States(U_steps, Psi_0):
+    """States at every grid point for a chain of step propagators (axis -3)
+
+    Works for propagators of any size, e.g. 9x9 superoperators acting on
+    vectorized density matrices. The chain is cut into about sqrt(n) blocks: prefix products inside all
+    blocks are built together, the block totals are chained, and the block
+    start states are then pushed through the prefixes in one batched product.
+    This keeps the number of NumPy calls at O(sqrt(n)) instead of O(n).
+    """
+    n, d = U_steps.shape[-3], U_steps.shape[-1]
+    Batch = U_steps.shape[:-3]
+    Block = max(1, int(np.ceil(np.sqrt(n))))
+    Blocks = -(-n // Block)
+
+    # Pad with identities so the steps reshape into (Blocks, Block)
+    Padded = np.empty(Batch + (Blocks * Block, d, d), dtype=complex)
+    Padded[..., :n, :, :] = U_steps
+    Padded[..., n:, :, :] = np.eye(d)
+    Padded = Padded.reshape(Batch + (Blocks, Block, d, d))
+
+    Prefix = np.empty_like(Padded)
+    Prefix[..., 0, :, :] = Padded[..., 0, :, :]
+    for j in range(1, Block):
+        np.matmul(Padded[..., j, :, :], Prefix[..., j - 1, :, :], out=Prefix[..., j, :, :])
+
+    # State entering each block, kept as column vectors for matmul
+    Starts = np.empty(Batch + (Blocks, d, 1), dtype=complex)
+    Starts[..., 0, :, 0] = Psi_0
+    for k in range(1, Blocks):
+        np.matmul(Prefix[..., k - 1, -1, :, :], Starts[..., k - 1, :, :], out=Starts[..., k, :, :])
+
+    Inside = (Prefix @ Starts[..., None, :, :]).reshape(Batch + (Blocks * Block, d))
+
+    States = np.empty(Batch + (n + 1, d), dtype=complex)
+    States[..., 0, :] = Psi_0
+    States[..., 1:, :] = Inside[..., :n, :]
+
+    return States
+
+
+def Propagate(Omega_P1_Smooth, Omega_S1_Smooth, tlist, E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5, Omega_S=4.5):
+    """Populations of levels 1-3 over tlist, starting in level 1
+
+    Returns an array of shape (..., 3, len(tlist))
+    """
+    tlist = np.asarray(tlist, dtype=float)
+
+    H_steps = Step_Hamiltonians(Omega_P1_Smooth, Omega_S1_Smooth, E1, E2, E3, Omega_P, Omega_S)
+    U_steps = Step_Propagators(H_steps, np.diff(tlist))
+    States = Propagate_States(U_steps, np.array([1.0, 0.0, 0.0]))
+
+    return np.swapaxes(np.abs(States) ** 2, -1, -2)
+
+
+def Chain_Product(U_steps):
+    """U_(n-1) ... U_1 U_0 for a chain of step propagators (axis -3)
+
+    Neighbouring steps are multiplied pairwise, halving the chain each round,
+    so the product takes O(log n) batched matmuls.
+    """
+    while U_steps.shape[-3] > 1:
+        Pairs = U_steps[..., 1::2, :, :] @ U_steps[..., 0:-1:2, :, :]
+        if U_steps.shape[-3] % 2:
+            Pairs = np.concatenate([Pairs, U_steps[..., -1:, :, :]], axis=-3)
+        U_steps = Pairs
+    return U_steps[..., 0, :, :]
+
+
+def Final_Populations(Omega_P1_Smooth, Omega_S1_Smooth, tlist, block_size=BLOCK_SIZE, E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5,
+                      Omega_S=4.5):
+    """Populations of levels 1-3 at the end of tlist only, shape (..., 3)
+
+    Same steps as Propagate, but no states or traces are kept: the step
+    propagators are built one block of time steps at a time, multiplied
+    together and applied to the running state. A block holds at most
+    block_size step propagators over the whole batch, which bounds the memory.
+    """
+    tlist = np.asarray(tlist, dtype=float)
+    Check_Samples(tlist.shape[-1])
+    Omega_P1_Smooth = np.asarray(Omega_P1_Smooth, dtype=float)
+    Omega_S1_Smooth = np.asarray(Omega_S1_Smooth, dtype=float)
+    dt = np.diff(tlist)
+    n = dt.shape[-1]
+    Batch = np.broadcast_shapes(Omega_P1_Smooth.shape[:-1], Omega_S1_Smooth.shape[:-1], tlist.shape[:-1])
+    block = max(1, block_size // max(1, int(np.prod(Batch))))
+
+    State = None
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        H_steps = Step_Hamiltonians(Omega_P1_Smooth[..., start:stop + 1], Omega_S1_Smooth[..., start:stop + 1],
+                                    E1, E2, E3, Omega_P, Omega_S)
+        U_block = Chain_Product(Step_Propagators(H_steps, dt[..., start:stop]))
+        # The first block starts from |1>, so its state is the first column
+        State = U_block[..., :, 0] if State is None else np.einsum('...ij,...j->...i', U_block, State)
+
+    return np.abs(State) ** 2
+
+
+def Native_Solve(Omega_P1_Smooth, Omega_S1_Smooth, tlist, **params):
+    """Drop-in replacement for Objective.mesolve(tlist, e_ops=[Proj_1, Proj_2, Proj_3])"""
+    return PropagatorResult(np.asarray(tlist), Propagate(Omega_P1_Smooth, Omega_S1_Smooth, tlist, **params))
+
+
+def Final_Population_Gradient(Omega_P1_Smooth, Omega_S1_Smooth, tlist, E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5,
+                              Omega_S=4.5):
+    """Final level-3 population and its gradient with respect to every pulse sample
+
+    The gradient is exact for the discretized dynamics Propagate integrates,
+    from one forward propagation of |1> and one backward (adjoint)
+    propagation of <3|. For every step U = exp(-i H dt) the derivative along
+    a coupling operator dH is taken in the eigenbasis of H, where it is
+    (V^T dH V) times the divided differences of exp(-i x dt), so no extra
+    solves are needed. The midpoint rule then spreads each step's derivative
+    evenly over its two end samples.
+
+    Returns (final, dPump, dStokes) with dPump and dStokes shaped like the
+    pulse arrays.
+    """
+    tlist = np.asarray(tlist, dtype=float)
+    dt = np.diff(tlist)
+
+    H_steps = Step_Hamiltonians(Omega_P1_Smooth, Omega_S1_Smooth, E1, E2, E3, Omega_P, Omega_S)
+    U_steps = Step_Propagators(H_steps, dt)
+
+    # Forward states psi_k, and adjoint states chi_k = U_k^H ... U_(n-1)^H |3>
+    # read back in step order, so the step k sits between psi_k and chi_(k+1)
+    Forward = Propagate_States(U_steps, np.array([1.0, 0.0, 0.0]))
+    Backward = Propagate_States(np.conj(np.swapaxes(U_steps[..., ::-1, :, :], -1, -2)), np.array([0.0, 0.0, 1.0]))
+    Psi, Chi = Forward[..., :-1, :], Backward[..., -2::-1, :]
+    Amplitude = Forward[..., -1, 2]
+
+    Energies, Vectors = np.linalg.eigh(H_steps)
+    F_Divided = _Exp_Divided_Difference(Energies[..., :, None], Energies[..., None, :], dt[:, None, None])
+    Psi_Eigen = np.einsum('...ji,...j->...i', Vectors, Psi)
+    Chi_Eigen = np.einsum('...ji,...j->...i', Vectors, Chi)
+
+    Gradients = []
+    for row, column in ((0, 1), (1, 2)):
+        # dH/dOmega for the pump (levels 1-2) and Stokes (levels 2-3) couplings
+        dH_Eigen = -0.5 * (Vectors[..., row, :, None] * Vectors[..., column, None, :]
+                           + Vectors[..., column, :, None] * Vectors[..., row, None, :])
+        dAmplitude = np.einsum('...i,...ij,...j->...', np.conj(Chi_Eigen), dH_Eigen * F_Divided, Psi_Eigen)
+        dStep = 2.0 * np.real(np.conj(Amplitude)[..., None] * dAmplitude)
+
+        dSamples = np.zeros(dStep.shape[:-1] + (dStep.shape[-1] + 1,))
+        dSamples[..., 1:] += 0.5 * dStep
+        dSamples[..., :-1] += 0.5 * dStep
+        Gradients.append(dSamples)
+
+    return np.abs(Amplitude) ** 2, Gradients[0], Gradients[1]
+
+
+def Knot_Gradient(Pump_Knots, Stokes_Knots, T_end=9, samples=SAMPLES, **params):
+    """Final level-3 population and its gradient with respect to the slider knots
+
+    The smoothing is the linear map Smoothing_Matrix, so the pulse-sample
+    gradient of Final_Population_Gradient is pulled back onto the knots with
+    its transpose. Leading batch dimensions on the knots are kept. Returns
+    (final, dPump_Knots, dStokes_Knots).
+    """
+    Matrix = Smoothing_Matrix(T_end, samples)
+    Final, dPump, dStokes = Final_Population_Gradient(
+        Omega_Smooth(Pump_Knots, T_end, samples), Omega_Smooth(Stokes_Knots, T_end, samples),
+        np.linspace(0, T_end, samples), **params)
+    return Final, dPump @ Matrix, dStokes @ Matrix
+
+
+def Simulate_Batch(Pump_Knots, Stokes_Knots, T_end=9, traces=False, chunk_size=32, samples=SAMPLES, **params):
+    """Final level-3 populations for N pump/Stokes pairs in slider format
+
+    Pump_Knots and Stokes_Knots are (N, T_end + 1) arrays, the same 10-point
+    vectors the sliders produce. Pulses are smoothed and propagated chunk by
+    chunk, each chunk as one stacked computation, which bounds the memory of
+    the intermediate step propagators.
+
+    Returns an (N,) array of final level-3 populations. With traces=True it
+    returns (final, times, populations) where populations is (N, 3, samples).
+    """
+    Pump_Knots = np.atleast_2d(np.asarray(Pump_Knots, dtype=float))
+    Stokes_Knots = np.atleast_2d(np.asarray(Stokes_Knots, dtype=float))
+    if Pump_Knots.shape != Stokes_Knots.shape or Pump_Knots.shape[1] != T_end + 1:
+        raise ValueError("expected two (N, %d) knot arrays, got %s and %s"
+                         % (T_end + 1, Pump_Knots.shape, Stokes_Knots.shape))
+
+    Check_Samples(samples)
+
+    N = Pump_Knots.shape[0]
+    t = np.linspace(0, T_end, samples)
+    Final = np.empty(N)
+    Populations = np.empty((N, 3, len(t))) if traces else None
+
+    for start in range(0, N, chunk_size):
+        stop = min(start + chunk_size, N)
+        Omega_P1_Smooth = Omega_Smooth(Pump_Knots[start:stop], T_end, samples)
+        Omega_S1_Smooth = Omega_Smooth(Stokes_Knots[start:stop], T_end, samples)
+
+        if traces:
+            Chunk = Propagate(Omega_P1_Smooth, Omega_S1_Smooth, t, **params)
+            Final[start:stop] = Chunk[:, 2, -1]
+            Populations[start:stop] = Chunk
+        else:
+            Final[start:stop] = Final_Populations(Omega_P1_Smooth, Omega_S1_Smooth, t, **params)[:, 2]
+
+    if traces:
+        return Final, t, Populations
+    return Final
+
+
+if __name__ == "__main__":
+    # Compare against the QuTiP path and report timing
+    import timeit
+    import krotov
+    from Backend import Basis, Hamiltonian, RWA_Target_State
+
+    T_end = 9
+    t = np.linspace(0, T_end, SAMPLES)
+    rng = np.random.default_rng(0)
+
+    worst = 0.0
+    for trial in range(20):
+        knots_P = np.concatenate([[0.0], rng.uniform(-1, 1, 8), [0.0]])
+        knots_S = np.concatenate([[0.0], rng.uniform(-1, 1, 8), [0.0]])
+        Omega_P1_Smooth = Omega_Smooth(knots_P, T_end)
+        Omega_S1_Smooth = Omega_Smooth(knots_S, T_end)
+
+        Kets, Projectors = Basis()
+        Objective = krotov.Objective(initial_state=Kets[0], target=RWA_Target_State(Kets[2]),
+                                     H=Hamiltonian(Omega_P1_Smooth, Omega_S1_Smooth))
+        Reference = Objective.mesolve(t, e_ops=list(Projectors))
+
+        Native = Propagate(Omega_P1_Smooth, Omega_S1_Smooth, t)
+        worst = max(worst, np.max(np.abs(Native - np.array(Reference.expect))))
+
+    print("Max deviation from mesolve: %.2e (tolerance %.0e)" % (worst, MESOLVE_TOLERANCE))
+    print("Score-only path vs full traces: %.2e" % np.max(np.abs(
+        Final_Populations(Omega_P1_Smooth, Omega_S1_Smooth, t) - Native[:, -1])))
+
+    # Adjoint knot gradient against central finite differences
+    h = 1e-6
+    Final, dPump, dStokes = Knot_Gradient(knots_P, knots_S, T_end)
+    Finite = np.empty((2, T_end + 1))
+    for j, Step in enumerate(h * np.eye(T_end + 1)):
+        Finite[0, j] = (Simulate_Batch(knots_P + Step, knots_S, T_end) - Simulate_Batch(knots_P - Step, knots_S, T_end))[0]
+        Finite[1, j] = (Simulate_Batch(knots_P, knots_S + Step, T_end) - Simulate_Batch(knots_P, knots_S - Step, T_end))[0]
+    print("Max knot gradient deviation from finite differences: %.2e" % np.max(np.abs(
+        np.array([dPump, dStokes]) - Finite / (2 * h))))
+
+    n = 200
+    seconds = timeit.timeit(lambda: Propagate(Omega_P1_Smooth, Omega_S1_Smooth, t), number=n) / n
+    print("Native propagation: %.3f ms per solve" % (seconds * 1e3))
+    seconds = timeit.timeit(lambda: Knot_Gradient(knots_P, knots_S, T_end), number=n) / n
+    print("Knot gradient: %.3f ms per pulse pair" % (seconds * 1e3))
+
+    Pump_Knots = np.zeros((5000, T_end + 1))
+    Stokes_Knots = np.zeros((5000, T_end + 1))
+    Pump_Knots[:, 1:-1] = rng.uniform(-1, 1, (5000, 8))
+    Stokes_Knots[:, 1:-1] = rng.uniform(-1, 1, (5000, 8))
+    seconds = timeit.timeit(lambda: Simulate_Batch(Pump_Knots, Stokes_Knots, T_end), number=1)
+    print("Batch scoring: %.0f pulse pairs per second" % (len(Pump_Knots) / seconds))
@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+# Observable knot values for the pump and Stokes pulses.
+#
+# The sliders, presets and reset write into the model; plots and the
+# simulation scheduler listen to `changed`. Writes made inside `with
+# model.batch():` are collected and announced with a single `changed`
+# emission when the outermost batch ends, so a preset that moves ten sliders
+# costs one redraw instead of ten.
+class PulseModel(QObject):
+    # Indices of the pulses whose knots changed, as a sorted tuple
+    changed = pyqtSignal(tuple)
+
+    def __init__(self, knots, pulses=2):
+        super().__init__()
+        self._values = [np.zeros(knots) for _ in range(pulses)]
+        self._batch_depth = 0
+        self._dirty = set()
+
+    def values(self, pulse):
+        """Copy of the knot values of one pulse"""
+        return self._values[pulse].copy()
+
+    def set_value(self, pulse, index, value):
+        if self._values[pulse][index] == value:
+            return
+        self._values[pulse][index] = value
+        self._mark(pulse)
+
+    def set_values(self, pulse, values):
+        values = np.asarray(values, dtype=float)
+        if np.array_equal(self._values[pulse], values):
+            return
+        self._values[pulse][:] = values
+        self._mark(pulse)
+
+    @contextmanager
+    def batch(self):
+        """Coalesce every change made inside the block into one notification"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._flush()
+
+    def _mark(self, pulse):
+        self._dirty.add(pulse)
+        if self._batch_depth == 0:
+            self._flush()
+
+    def _flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = tuple(sorted(self._dirty)), set()
+        self.changed.emit(dirty)
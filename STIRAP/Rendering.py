@@ -0,0 +1,63 @@
+import math
+
+
+# Blitting helper for the interactive pulse plots.
+#
+# Artists registered here are marked animated, so a normal canvas draw renders
+# everything else (axes, ticks, labels, static lines) once and the result is
+# cached as the background. An update then only restores that background and
+# redraws the registered artists, and only the changed region is repainted.
+# Any full redraw (resize, axis change, draw_idle) re-caches the background.
+class BlitManager:
+    def __init__(self, canvas, artists=()):
+        self.canvas = canvas
+        self._background = None
+        self._artists = []
+
+        for artist in artists:
+            self.add_artist(artist)
+
+        self._draw_connection = canvas.mpl_connect("draw_event", self._on_draw)
+
+    def add_artist(self, artist):
+        if artist.figure != self.canvas.figure:
+            raise ValueError("artist does not belong to this canvas")
+        artist.set_animated(True)
+        self._artists.append(artist)
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self._artists:
+            self.canvas.figure.draw_artist(artist)
+
+    def update(self, artists=None):
+        """Repaint changed artists over the cached background
+
+        Only the axes holding the given artists (all registered ones by
+        default) are restored, redrawn and blitted.
+        """
+        if self._background is None:
+            # Nothing cached yet; the first full draw will render the artists
+            self.canvas.draw_idle()
+            return
+
+        changed = self._artists if artists is None else artists
+        axes = []
+        for artist in changed:
+            if artist.axes not in axes:
+                axes.append(artist.axes)
+
+        # Agg regions count rows from the top, display coordinates from the bottom;
+        # xy is where the origin of the (full-figure) background goes
+        height = self.canvas.figure.bbox.height
+        for ax in axes:
+            x0, y0, x1, y1 = ax.bbox.extents
+            region = (math.floor(x0), math.floor(height - y1), math.ceil(x1) + 1, math.ceil(height - y0) + 1)
+            self.canvas.restore_region(self._background, bbox=region, xy=(0, 0))
+            for artist in self._artists:
+                if artist.axes is ax:
+                    self.canvas.figure.draw_artist(artist)
+            self.canvas.blit(ax.bbox)
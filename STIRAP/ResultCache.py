@@ -0,0 +1,122 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from Backend import SAMPLES
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "result_cache.npz")
+
+
+# Version of the key layout in saved files; files with another layout are not loaded
+KEY_VERSION = 2
+
+
+def Cache_Key(Pump_Knots, Stokes_Knots, T_end, solver="native", samples=SAMPLES, E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5,
+              Omega_S=4.5):
+    """Hashable key for a simulation request
+
+    Knots are quantized to the 0.01 slider step, so pulses that only differ
+    below slider resolution (e.g. the float-valued presets) share an entry.
+    """
+    Quantized = np.rint(np.concatenate([np.ravel(Pump_Knots), np.ravel(Stokes_Knots)]) * 100).astype(int)
+    return tuple(Quantized.tolist()) + (float(E1), float(E2), float(E3), float(Omega_P), float(Omega_S), int(T_end),
+                                        int(samples), solver)
+
+
+# Bounded LRU cache of simulation results.
+#
+# Each entry holds the time grid, the three population traces and the score.
+# The cache is bounded by the bytes held in those arrays; the least recently
+# used entries are evicted first. With a path it can be saved to and reloaded
+# from a single .npz file so it survives kiosk restarts; loading is left to the
+# caller so it can happen off the startup path. Lookups are guarded by
+# a lock because the simulation worker and the GUI thread both use it.
+class ResultCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, path=None):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """(times, populations, score) for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, times, populations, score):
+        times = np.array(times, dtype=float)
+        populations = np.array(populations, dtype=float)
+        size = times.nbytes + populations.nbytes
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._size(self._entries.pop(key))
+            # An entry larger than the whole bound is not kept; max_bytes=0 disables the cache
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (times, populations, int(score))
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= self._size(evicted)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
+
+    def save(self, path=None):
+        """Write all entries, oldest first, to an .npz file"""
+        path = path or self.path
+        if path is None:
+            return
+        with self._lock:
+            entries = list(self._entries.items())
+
+        arrays = {}
+        for i, (key, (times, populations, score)) in enumerate(entries):
+            arrays["key_%d" % i] = np.array([str(part) for part in key])
+            arrays["times_%d" % i] = times
+            arrays["populations_%d" % i] = populations
+            arrays["score_%d" % i] = np.array(score)
+
+        # Write-then-rename so an interrupted save keeps the previous file
+        temporary = path + ".tmp.npz"
+        np.savez_compressed(temporary, count=np.array(len(entries)), version=np.array(KEY_VERSION), **arrays)
+        os.replace(temporary, path)
+
+    def load(self, path=None):
+        """Merge entries from an .npz file written by save(), if it exists"""
+        path = path or self.path
+        if path is None or not os.path.exists(path):
+            return
+        with np.load(path) as data:
+            if "version" not in data or int(data["version"]) != KEY_VERSION:
+                return
+            for i in range(int(data["count"])):
+                self.put(self._parse_key(data["key_%d" % i]), data["times_%d" % i], data["populations_%d" % i],
+                         int(data["score_%d" % i]))
+
+    @staticmethod
+    def _size(entry):
+        times, populations, _ = entry
+        return times.nbytes + populations.nbytes
+
+    @staticmethod
+    def _parse_key(parts):
+        # Layout from Cache_Key: knot integers, 5 parameters, T_end, samples, solver
+        parts = [str(part) for part in parts]
+        return (tuple(int(p) for p in parts[:-8]) + tuple(float(p) for p in parts[-8:-3])
+                + (int(parts[-3]), int(parts[-2]), parts[-1]))
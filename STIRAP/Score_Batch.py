@@ -0,0 +1,187 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from Backend import SAMPLES
+from Propagator import Simulate_Batch
+
+# Headless scoring of pulse files, without Qt.
+#
+# Each input record is one pump and one Stokes knot vector in slider format
+# (T_end + 1 values each, 10 by default):
+#   .csv    2 * (T_end + 1) numbers per row, pump first; a header row is skipped
+#   .npy    an (N, 2 * (T_end + 1)) or (N, 2, T_end + 1) array, memory-mapped
+#   .jsonl  one {"pump": [...], "stokes": [...]} object per line; an optional
+#           "score" is treated as a claimed score and checked
+# Records are read and simulated chunk by chunk, so memory stays bounded by the
+# chunk size (times the number of chunks in flight with --workers). Scores are
+# written as CSV rows as soon as their chunk is done, and population traces
+# optionally go to an .npy memory map of shape (N, 3, samples).
+#
+#   python Score_Batch.py pulses.jsonl --output scores.csv --workers 4
+
+
+def Input_Format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in (".csv", ".npy", ".jsonl"):
+        raise ValueError("unsupported input %s, expected .csv, .npy or .jsonl" % path)
+    return extension[1:]
+
+
+def Count_Records(path, T_end=9):
+    """Number of records in an input file, read chunk by chunk"""
+    if Input_Format(path) == "npy":
+        return len(np.load(path, mmap_mode="r"))
+    return sum(len(Knots) for Knots, _ in Read_Chunks(path, 4096, T_end))
+
+
+def _Parse_Row(row, T_end):
+    values = np.asarray(row, dtype=float)
+    if values.size != 2 * (T_end + 1):
+        raise ValueError("expected %d knot values per record, got %d" % (2 * (T_end + 1), values.size))
+    return values.reshape(2, T_end + 1)
+
+
+def Read_Chunks(path, chunk_size, T_end=9):
+    """Yield (knots, claimed) per chunk; knots is (n, 2, T_end + 1)
+
+    claimed holds the claimed scores of .jsonl records (NaN where absent) and
+    is None for the other formats.
+    """
+    form = Input_Format(path)
+
+    if form == "npy":
+        Records = np.load(path, mmap_mode="r")
+        for start in range(0, len(Records), chunk_size):
+            Chunk = np.asarray(Records[start:start + chunk_size], dtype=float)
+            yield np.array([_Parse_Row(row, T_end) for row in Chunk]), None
+        return
+
+    with open(path, newline="") as file:
+        rows, claimed = [], []
+        lines = csv.reader(file) if form == "csv" else file
+
+        for number, line in enumerate(lines):
+            if form == "csv":
+                if not line:
+                    continue
+                try:
+                    row = [float(value) for value in line]
+                except ValueError:
+                    if number == 0:
+                        continue  # header
+                    raise
+            else:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                row = list(record["pump"]) + list(record["stokes"])
+                claimed.append(record.get("score", np.nan))
+
+            rows.append(_Parse_Row(row, T_end))
+            if len(rows) == chunk_size:
+                yield np.array(rows), (np.array(claimed, dtype=float) if form == "jsonl" else None)
+                rows, claimed = [], []
+
+        if rows:
+            yield np.array(rows), (np.array(claimed, dtype=float) if form == "jsonl" else None)
+
+
+def _Score_Chunk(job):
+    # Top-level so the process pool can pickle it
+    Knots, T_end, traces, samples = job
+    return Simulate_Batch(Knots[:, 0], Knots[:, 1], T_end, traces=traces, samples=samples)
+
+
+def Score_File(path, output, T_end=9, chunk_size=256, workers=1, traces_path=None, samples=SAMPLES):
+    """Score every record of path, writing CSV rows to the output file object
+
+    Returns (records scored, records whose claimed score does not match).
+    """
+    Traces = None
+    if traces_path is not None:
+        Traces = np.lib.format.open_memmap(traces_path, mode="w+", dtype=float,
+                                           shape=(Count_Records(path, T_end), 3, samples))
+
+    writer = csv.writer(output)
+    header = ["index", "population", "score"]
+    if Input_Format(path) == "jsonl":
+        header += ["claimed", "match"]
+    writer.writerow(header)
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    in_flight = deque()
+    scored = mismatched = 0
+
+    def Write(result, claimed):
+        nonlocal scored, mismatched
+        Final = result[0] if Traces is not None else result
+        if Traces is not None:
+            Traces[scored:scored + len(Final)] = result[2]
+
+        Scores = (Final * 100).astype(int)
+        for i, (population, score) in enumerate(zip(Final, Scores)):
+            row = [scored + i, "%.6f" % population, score]
+            if claimed is not None:
+                match = np.isnan(claimed[i]) or int(claimed[i]) == score
+                mismatched += not match
+                row += ["" if np.isnan(claimed[i]) else int(claimed[i]), int(match)]
+            writer.writerow(row)
+        output.flush()
+        scored += len(Final)
+
+    try:
+        for Knots, claimed in Read_Chunks(path, chunk_size, T_end):
+            job = (Knots, T_end, Traces is not None, samples)
+            if pool is None:
+                Write(_Score_Chunk(job), claimed)
+                continue
+
+            # Keep a bounded window of chunks in flight and write them in order
+            in_flight.append((pool.submit(_Score_Chunk, job), claimed))
+            if len(in_flight) >= 2 * workers:
+                future, claimed = in_flight.popleft()
+                Write(future.result(), claimed)
+
+        while in_flight:
+            future, claimed = in_flight.popleft()
+            Write(future.result(), claimed)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if Traces is not None:
+            Traces.flush()
+
+    return scored, mismatched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score pump/Stokes knot vectors without a display")
+    parser.add_argument("input", help=".csv, .npy or .jsonl file of knot vectors")
+    parser.add_argument("--output", default="-", help="CSV file for the scores (default: stdout)")
+    parser.add_argument("--traces", help=".npy file for the (N, 3, samples) population traces")
+    parser.add_argument("--samples", type=int, default=SAMPLES, help="time-grid points per pulse")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=1, help="processes; 0 for one per core")
+    parser.add_argument("--T-end", type=int, default=9)
+    options = parser.parse_args()
+    if options.samples < 2:
+        parser.error("--samples must be at least 2")
+
+    workers = options.workers or os.cpu_count()
+    output = sys.stdout if options.output == "-" else open(options.output, "w", newline="")
+    try:
+        scored, mismatched = Score_File(options.input, output, options.T_end, options.chunk_size, workers,
+                                        options.traces, options.samples)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print("scored %d records" % scored, file=sys.stderr)
+    if mismatched:
+        print("%d claimed scores do not match" % mismatched, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,251 @@
+import json
+import os
+import threading
+import time
+import uuid
+from Timing import TIMINGS
+
+SET_SCORE_URL = "https://gmscoreboard.com/api/set-score/"
+TAG_ID = "94b47096b96f2864e21376a548822b09"
+
+DEFAULT_OUTBOX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scoreboard_outbox.json")
+
+# 4xx responses that say "not now" rather than "never": request timeout and
+# rate limiting
+RETRY_STATUS = (408, 429)
+
+
+class GmScoreboardEndpoint:
+    """The gmscoreboard set-score API; swap for another endpoint in tests"""
+
+    def __init__(self, url=SET_SCORE_URL, tag_id=TAG_ID):
+        self.url = url
+        self.tag_id = tag_id
+
+    def send(self, session, entry, timeout):
+        response = session.get(self.url, params={"tagid": self.tag_id, "player": entry["player"], "score": entry["score"]},
+                               timeout=timeout)
+        response.raise_for_status()
+
+
+# Offline-tolerant score submission.
+#
+# Scores are appended to an on-disk outbox before anything touches the
+# network, so a crash or a dead connection never loses them. A daemon thread
+# drains the outbox through one requests.Session (keep-alive connection
+# reuse), backing off exponentially while the service is unreachable or busy
+# (connection errors, timeouts, 5xx responses and the RETRY_STATUS codes, for
+# at least as long as a Retry-After header asks). Once it is reachable again
+# everything that piled up is sent back to back in batches, with a single
+# outbox rewrite per batch. An entry the service rejects (any other 4xx
+# response, or any other error that retrying cannot fix) is moved to the
+# rejected file with its error and the rest of the queue carries on.
+class ScoreSubmitter:
+    def __init__(self, path=DEFAULT_OUTBOX, endpoint=None, timeout=5.0, initial_backoff=1.0, max_backoff=300.0,
+                 batch_size=50, rejected_path=None):
+        self.path = path
+        self.rejected_path = rejected_path or os.path.splitext(path)[0] + "_rejected.json"
+        self.endpoint = endpoint if endpoint is not None else GmScoreboardEndpoint()
+        self.timeout = timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._outbox = self._load()
+
+        self.delivered = 0
+        self.rejected = 0
+        self.last_error = None
+
+        self._thread = threading.Thread(target=self._run, name="ScoreSubmitter", daemon=True)
+        self._thread.start()
+
+    def submit(self, player, score):
+        """Queue a score for delivery; returns immediately"""
+        entry = {"id": uuid.uuid4().hex, "player": player, "score": score, "time": time.time()}
+        with self._lock:
+            self._outbox.append(entry)
+            self._save()
+        self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._outbox)
+
+    def stop(self, timeout=None):
+        """Stop the delivery thread; undelivered scores stay in the outbox"""
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def _load(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return []
+        except ValueError:
+            # Keep a corrupt outbox aside instead of overwriting it
+            os.replace(self.path, self.path + ".corrupt")
+            return []
+
+    def _save(self):
+        # Write-then-rename so a crash mid-write leaves the old outbox intact
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(self._outbox, file)
+        os.replace(temporary, self.path)
+
+    def _run(self):
+        # Imported here so loading requests never delays the window
+        import requests
+
+        session = requests.Session()
+        backoff = self.initial_backoff
+
+        while not self._stopping:
+            with self._lock:
+                batch = list(self._outbox[:self.batch_size])
+
+            if not batch:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            done, rejected, transient, retry_after = [], [], False, None
+            for entry in batch:
+                if self._stopping:
+                    break
+                try:
+                    with TIMINGS.span("scoreboard_http"):
+                        self.endpoint.send(session, entry, self.timeout)
+                except Exception as error:
+                    self.last_error = error
+                    if _Is_Transient(error):
+                        transient = True
+                        retry_after = _Retry_After(error)
+                        break
+                    rejected.append(dict(entry, error=repr(error)))
+                done.append(entry)
+
+            if done:
+                self._remove(done, rejected)
+
+            if not transient:
+                backoff = self.initial_backoff
+                continue
+
+            # Service unreachable or busy: wait, but wake early on stop()
+            if retry_after is not None:
+                backoff = max(backoff, min(retry_after, self.max_backoff))
+            self._wake.wait(backoff)
+            self._wake.clear()
+            backoff = min(backoff * 2, self.max_backoff)
+
+        session.close()
+
+    def _remove(self, entries, rejected):
+        done_ids = set(entry["id"] for entry in entries)
+        with self._lock:
+            if rejected:
+                self._reject(rejected)
+            self._outbox = [entry for entry in self._outbox if entry["id"] not in done_ids]
+            self._save()
+        self.delivered += len(entries) - len(rejected)
+        self.rejected += len(rejected)
+
+    def _reject(self, entries):
+        # Appended before the outbox rewrite, so a crash in between can only
+        # leave an entry in both files, never in neither
+        try:
+            with open(self.rejected_path) as file:
+                rejected = json.load(file)
+        except (FileNotFoundError, ValueError):
+            rejected = []
+        temporary = self.rejected_path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(rejected + entries, file)
+        os.replace(temporary, self.rejected_path)
+
+
+def _Is_Transient(error):
+    """True for failures worth retrying: no connection, a timeout, a 5xx or a RETRY_STATUS response"""
+    import requests
+
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        return response is None or response.status_code >= 500 or response.status_code in RETRY_STATUS
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def _Retry_After(error):
+    """Seconds asked for by the Retry-After header of an HTTPError, or None"""
+    from email.utils import parsedate_to_datetime
+
+    response = getattr(error, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # An HTTP date instead of a number of seconds
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+if __name__ == "__main__":
+    # Deliver a few scores to a local stand-in for the scoreboard service,
+    # which rejects an empty player name like the real one and rate-limits
+    # the first request
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from urllib.parse import urlparse, parse_qs
+
+    received = []
+    limited = []
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            if not limited:
+                limited.append(query)
+                self.send_response(429)
+                self.send_header("Retry-After", "0.2")
+                self.end_headers()
+                return
+            if "player" not in query:
+                self.send_response(400)
+                self.end_headers()
+                return
+            received.append(query)
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    outbox = os.path.join(tempfile.mkdtemp(), "outbox.json")
+    endpoint = GmScoreboardEndpoint(url="http://127.0.0.1:%d/api/set-score/" % server.server_port)
+    submitter = ScoreSubmitter(outbox, endpoint=endpoint)
+    submitter.submit("", 0)
+    for score in (42, 87, 100):
+        submitter.submit("Player One", score)
+
+    while submitter.pending():
+        time.sleep(0.05)
+    submitter.stop()
+    server.shutdown()
+
+    print("Delivered %d scores:" % submitter.delivered, [(r["player"][0], r["score"][0]) for r in received])
+    print("Rejected %d scores -> %s" % (submitter.rejected, submitter.rejected_path))
+    print("Rate-limited %d request, last error %r" % (len(limited), submitter.last_error))
@@ -0,0 +1,146 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from Backend import SAMPLES, Omega_Smooth
+from Propagator import Final_Populations
+
+# Transfer-efficiency maps over the system parameters.
+#
+# A sweep evaluates the final level-3 population of one fixed pulse pair over
+# the grid spanned by the E1, E2, E3, Omega_P, Omega_S and T_end axes. The
+# pulse shapes are fixed; T_end stretches them over a longer or shorter
+# duration. The flattened grid is cut into chunks, each chunk is propagated as
+# one stacked computation, and chunks run in a process pool.
+#
+# Results go to an .npy file opened as a memory map, so the grid never has to
+# fit in RAM. Next to it, <path>.done.npy marks finished chunks (a chunk is
+# only marked after its values are flushed) and <path>.json records the axes
+# and pulses. Calling Sweep again with the same arguments resumes an
+# interrupted sweep and skips the finished chunks.
+
+AXES = ("E1", "E2", "E3", "Omega_P", "Omega_S", "T_end")
+DEFAULTS = dict(E1=0.0, E2=10.0, E3=5.0, Omega_P=9.5, Omega_S=4.5, T_end=9)
+
+# Seconds between flushes of finished chunks to disk
+FLUSH_INTERVAL = 1.0
+
+
+def _Sweep_Chunk(job):
+    # Top-level so the process pool can pickle it
+    chunk, start, stop, shape, axes, Omega_P1_Shape, Omega_S1_Shape = job
+
+    Index = np.unravel_index(np.arange(start, stop), shape)
+    params = {name: axis[i][:, None] for name, axis, i in zip(AXES, axes, Index)}
+    T_end = params.pop("T_end")
+
+    # One stretched time grid per point; the sampled pulse shapes are shared
+    tlist = T_end * np.linspace(0.0, 1.0, len(Omega_P1_Shape))
+    Omega_P1 = np.broadcast_to(Omega_P1_Shape, tlist.shape)
+    Omega_S1 = np.broadcast_to(Omega_S1_Shape, tlist.shape)
+
+    return chunk, Final_Populations(Omega_P1, Omega_S1, tlist, **params)[:, 2]
+
+
+def Sweep(Pump_Knots, Stokes_Knots, path, chunk_size=128, workers=None, samples=SAMPLES, **axes):
+    """Final level-3 population over a parameter grid, as a read-only memory map
+
+    Each of E1, E2, E3, Omega_P, Omega_S and T_end may be given as a scalar
+    or a 1-D array of values; missing ones use the Hamiltonian defaults. The
+    result has one dimension per axis, in AXES order. The pulse knots are
+    spread evenly over [0, T_end] for every T_end.
+    """
+    unknown = set(axes) - set(AXES)
+    if unknown:
+        raise ValueError("unknown sweep axes: %s" % ", ".join(sorted(unknown)))
+
+    Axis_Values = tuple(np.atleast_1d(np.asarray(axes.get(name, DEFAULTS[name]), dtype=float)) for name in AXES)
+    shape = tuple(len(axis) for axis in Axis_Values)
+    size = int(np.prod(shape))
+    chunks = -(-size // chunk_size)
+
+    Pump_Knots = np.asarray(Pump_Knots, dtype=float)
+    Stokes_Knots = np.asarray(Stokes_Knots, dtype=float)
+    meta = {
+        "axes": {name: axis.tolist() for name, axis in zip(AXES, Axis_Values)},
+        "pump_knots": Pump_Knots.tolist(),
+        "stokes_knots": Stokes_Knots.tolist(),
+        "chunk_size": chunk_size,
+        "samples": samples,
+    }
+
+    if os.path.exists(path + ".json"):
+        with open(path + ".json") as file:
+            if json.load(file) != meta:
+                raise ValueError("%s holds a different sweep; remove it or choose another path" % path)
+        Result = np.load(path, mmap_mode="r+")
+        Done = np.load(path + ".done.npy", mmap_mode="r+")
+    else:
+        Result = np.lib.format.open_memmap(path, mode="w+", dtype=float, shape=shape)
+        Result[...] = np.nan
+        Done = np.lib.format.open_memmap(path + ".done.npy", mode="w+", dtype=bool, shape=(chunks,))
+        Done[:] = False
+        Result.flush()
+        Done.flush()
+        # Written last, so a sweep interrupted while being created starts over
+        with open(path + ".json", "w") as file:
+            json.dump(meta, file)
+
+    Omega_P1_Shape = Omega_Smooth(Pump_Knots, len(Pump_Knots) - 1, samples)
+    Omega_S1_Shape = Omega_Smooth(Stokes_Knots, len(Stokes_Knots) - 1, samples)
+    Flat = Result.reshape(-1)
+
+    jobs = [(chunk, chunk * chunk_size, min((chunk + 1) * chunk_size, size), shape, Axis_Values,
+             Omega_P1_Shape, Omega_S1_Shape) for chunk in np.flatnonzero(~Done)]
+
+    finished = []
+    last_flush = time.perf_counter()
+
+    def Flush():
+        Result.flush()
+        Done[finished] = True
+        Done.flush()
+        finished.clear()
+
+    pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+    try:
+        for future in as_completed([pool.submit(_Sweep_Chunk, job) for job in jobs]):
+            chunk, values = future.result()
+            Flat[chunk * chunk_size:chunk * chunk_size + len(values)] = values
+            finished.append(chunk)
+            if time.perf_counter() - last_flush > FLUSH_INTERVAL:
+                Flush()
+                last_flush = time.perf_counter()
+    finally:
+        # On an interruption drop the queued chunks and keep whatever finished
+        pool.shutdown(cancel_futures=True)
+        Flush()
+
+    # Everything is flushed, so the writable maps can stay open while the
+    # result is reopened read-only
+    return np.load(path, mmap_mode="r")
+
+
+if __name__ == "__main__":
+    # Transfer map over the pump and Stokes frequencies for the Gaussian presets
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Sweep the pump and Stokes frequencies")
+    parser.add_argument("--points", type=int, default=64, help="grid points per axis")
+    parser.add_argument("--output", default=os.path.join(tempfile.gettempdir(), "stirap_sweep.npy"))
+    options = parser.parse_args()
+
+    x_values = np.linspace(0, 2 * np.pi, 10)
+    Gaussian = np.exp(-(x_values - np.mean(x_values)) ** 2 / 2)
+
+    start = time.perf_counter()
+    Map = Sweep(Gaussian, Gaussian, options.output,
+                Omega_P=np.linspace(8.5, 10.5, options.points), Omega_S=np.linspace(3.5, 5.5, options.points))
+    elapsed = time.perf_counter() - start
+
+    print("%d points in %.2f s (%.0f points per second) -> %s" % (Map.size, elapsed, Map.size / elapsed, options.output))
+    P_Index, S_Index = np.unravel_index(np.nanargmax(Map), Map.shape)[3:5]
+    print("best transfer %.3f at Omega_P = %.3f, Omega_S = %.3f" % (
+        np.nanmax(Map), np.linspace(8.5, 10.5, options.points)[P_Index], np.linspace(3.5, 5.5, options.points)[S_Index]))
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# Per-stage timing spans for the kiosk pipeline.
+#
+# Code wraps each stage in `with TIMINGS.span("name"):`. While enabled, every
+# span's duration is kept in a rolling window per name (for percentiles) and,
+# with a log path, appended as one JSON line to the log file. While disabled,
+# span() hands back one shared no-op context manager, so an instrumented
+# stage costs a method call and an attribute check. Spans may be recorded from
+# any thread.
+
+_DISABLED = nullcontext()
+
+
+class Timings:
+    def __init__(self, enabled=False, window=500, log_path=None):
+        self.enabled = enabled
+        self.window = window
+        self.log_path = log_path
+
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._log = None
+
+    def configure(self, enabled=True, window=None, log_path=None):
+        with self._lock:
+            self.enabled = enabled
+            if window is not None:
+                self.window = window
+            if log_path != self.log_path and self._log is not None:
+                self._log.close()
+                self._log = None
+            self.log_path = log_path
+
+    def span(self, name):
+        """Context manager timing one stage; free when disabled"""
+        if not self.enabled:
+            return _DISABLED
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def wrap(self, name, function):
+        """function with every call timed as a span"""
+        def Timed(*args, **kwargs):
+            with self.span(name):
+                return function(*args, **kwargs)
+        return Timed
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+            if self.log_path is not None:
+                if self._log is None:
+                    self._log = open(self.log_path, "a", buffering=1)
+                self._log.write(json.dumps({"time": time.time(), "span": name, "seconds": seconds,
+                                            "thread": threading.current_thread().name}) + "\n")
+
+    def percentiles(self, name, quantiles=(0.5, 0.9, 0.99)):
+        """{quantile: seconds} over the rolling window of one span, or None"""
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if not samples:
+            return None
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in quantiles}
+
+    def summary(self):
+        """{name: (count, p50, p90, p99)} for every span seen, in seconds"""
+        with self._lock:
+            names = list(self._samples)
+        result = {}
+        for name in names:
+            p = self.percentiles(name)
+            if p is not None:
+                result[name] = (len(self._samples[name]), p[0.5], p[0.9], p[0.99])
+        return result
+
+    def report(self):
+        """Summary as fixed-width text, one span per line"""
+        lines = ["%-20s %5s %9s %9s %9s" % ("span", "n", "p50 ms", "p90 ms", "p99 ms")]
+        for name, (count, p50, p90, p99) in sorted(self.summary().items()):
+            lines.append("%-20s %5d %9.2f %9.2f %9.2f" % (name, count, p50 * 1e3, p90 * 1e3, p99 * 1e3))
+        return "\n".join(lines)
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+# Shared instance used by the GUI, the simulation path and the scoreboard
+TIMINGS = Timings()
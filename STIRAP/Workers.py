@@ -0,0 +1,87 @@
+import threading
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+
+class Cancelled(Exception):
+    """Raised inside a job when a newer request has superseded it"""
+
+
+# Background worker that runs one simulation job at a time on its own QThread.
+#
+# Jobs are plain callables taking a single `check_cancelled` argument; a job
+# calls it between its stages and it raises Cancelled once a newer request has
+# been submitted. Only the most recent pending request is kept, so a burst of
+# clicks collapses into one run of the last one. Long jobs can stream partial
+# results with report(), which arrive as `progress` signals.
+class SimulationWorker(QObject):
+    # (request id, result) for a job that ran to completion
+    finished = pyqtSignal(int, object)
+    # (request id, exception) for a job that raised
+    failed = pyqtSignal(int, object)
+    # (request id, value) passed to report() by the running job
+    progress = pyqtSignal(int, object)
+    _wake = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._pending = None
+        self._latest_id = 0
+        self._running_id = 0
+
+        self._thread = QThread()
+        self.moveToThread(self._thread)
+        self._wake.connect(self._run_pending)
+        self._thread.start()
+
+    def submit(self, job):
+        """Queue job, superseding any queued or running one; returns its request id"""
+        with self._lock:
+            self._latest_id += 1
+            request_id = self._latest_id
+            self._pending = (request_id, job)
+        self._wake.emit()
+        return request_id
+
+    def cancel(self):
+        """Cancel the running and queued jobs without starting a new one"""
+        with self._lock:
+            self._latest_id += 1
+            self._pending = None
+
+    def report(self, value):
+        """Emit progress for the running job; only call it from inside a job"""
+        self.progress.emit(self._running_id, value)
+
+    def is_current(self, request_id):
+        return request_id == self._latest_id
+
+    def stop(self):
+        self.cancel()
+        self._thread.quit()
+        self._thread.wait()
+
+    @pyqtSlot()
+    def _run_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is None:
+            return
+
+        request_id, job = pending
+        self._running_id = request_id
+
+        def check_cancelled():
+            if not self.is_current(request_id):
+                raise Cancelled()
+
+        try:
+            result = job(check_cancelled)
+        except Cancelled:
+            return
+        except Exception as error:
+            self.failed.emit(request_id, error)
+            return
+
+        if self.is_current(request_id):
+            self.finished.emit(request_id, result)